@@ -4,48 +4,416 @@ from sklearn.metrics.pairwise import cosine_similarity
 import random
 import spacy
 from spacy.lang.fr.stop_words import STOP_WORDS
+from spacy.tokens import Doc, DocBin
+from spacy.language import Language
+from spacy.lookups import Lookups, load_lookups
+from spacy.matcher import Matcher, PhraseMatcher
+from spacy.attrs import IS_STOP, IS_PUNCT, IS_SPACE, POS, LEMMA, LENGTH
+from spacy.parts_of_speech import IDS as POS_IDS
+import numpy as np
 import streamlit as st
+from streamlit import runtime as streamlit_runtime
 import re
 import string
-from io import BytesIO
+from io import BytesIO, StringIO
 import pandas as pd
 import matplotlib.pyplot as plt
 from wordcloud import WordCloud
-import pdfminer.high_level
-import docx
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdftypes import resolve1, PDFStream, PDFObjRef
+import multiprocessing
+from multiprocessing.connection import Client, Listener, AuthenticationError
+import queue
+import hashlib
+import uuid
+import zlib
+import subprocess
+import json
+import tempfile
+import time
+import mmap
+import shutil
+import zipfile
+import difflib
+from xml.etree import ElementTree
+import threading
+try:
+    import resource
+except ImportError:
+    # Module absent sous Windows : seul l'échantillonnage /proc est alors disponible (Linux)
+    resource = None
+from contextlib import contextmanager
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from array import array
+from bisect import bisect_right
+from typing import NamedTuple
 from openai import AzureOpenAI
 import os
+import sys
 import requests
 
 # Configuration de l'application
 st.set_page_config(page_title="Générateur de Cas de test à partir du CDC", layout="wide", page_icon="📑")
 
+# Extraction PDF parallèle : nombre de processus et taille minimale du document
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", os.cpu_count() or 1))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
+
+# Profils d'analyse de mise en page pdfminer (paramètres LAParams)
+PDF_PROFILES = {
+    # Lignes et blocs détectés, sans l'analyse hiérarchique des blocs (la plus coûteuse) : ordre de lecture brut
+    "fast": {"boxes_flow": None},
+    # Paramètres par défaut de pdfminer.high_level.extract_text
+    "balanced": {},
+    # Texte vertical et texte des figures inclus
+    "accurate": {"detect_vertical": True, "all_texts": True},
+}
+# Profil par défaut ; une valeur inconnue retombe sur « balanced »
+PDF_PROFILE = os.getenv("PDF_PROFILE", "balanced")
+if PDF_PROFILE not in PDF_PROFILES:
+    PDF_PROFILE = "balanced"
+
+# Cache disque partagé entre les processus Streamlit (éviction LRU au-delà de la taille max)
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(tempfile.gettempdir(), "cdc_cache"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# À incrémenter dès que le texte produit par l'extraction change
+EXTRACTOR_VERSION = "2"
+# À incrémenter dès que les règles produites pour un même texte changent (cache des règles par bloc)
+RULES_ENGINE_VERSION = "5"
+# Intervalle minimal (s) entre deux passes d'éviction d'un même processus
+CACHE_EVICTION_INTERVAL = 5.0
+# Taille des blocs de copie lors de l'écriture des fichiers téléversés sur disque
+SPOOL_BLOCK_SIZE = 1024 * 1024
+# Aperçu rapide : pages décodées immédiatement, le reste est extrait en arrière-plan
+PREVIEW_PAGES = int(os.getenv("PREVIEW_PAGES", "3"))
+PREVIEW_CHARS = 1000
+BACKGROUND_WORKERS = int(os.getenv("BACKGROUND_WORKERS", "4"))
+# Nombre maximal de documents extraits simultanément lors d'un téléversement multiple
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", min(4, os.cpu_count() or 1)))
+
+# Modèle spaCy et vues de son pipeline (None : pipeline complet, mesuré par benchmarks.py)
+NLP_MODEL_NAME = os.getenv("NLP_MODEL_NAME", "fr_core_news_md")
+NLP_STAGES = {
+    "full": None,
+    # Seule vue chargée par l'application : analyse partagée (nettoyage, règles, PDC), étiquettes, lemmes et phrases
+    "document": ["tok2vec", "morphologizer", "attribute_ruler", "lemmatizer", "senter"],
+    # Vues comparées par benchmarks.py (nlp-stages) uniquement : étiquettes et lemmes seuls
+    "tagging": ["tok2vec", "morphologizer", "attribute_ruler", "lemmatizer"],
+    # ... et frontières de phrases seules
+    "sentences": ["senter"],
+}
+
+# Regroupement des quasi-doublons de règles : part minimale des 3-grammes de mots de la plus courte présents dans l'autre
+RULE_DEDUP_THRESHOLD = 0.8
+RULE_SHINGLE_WORDS = 3
+# Signatures MinHash : bandes LSH × lignes par bande
+MINHASH_BANDS = 16
+MINHASH_ROWS = 4
+# Nombre de 3-grammes les plus rares indexés par règle pour détecter les inclusions
+CONTAINMENT_RARE_SHINGLES = 2
+
+# Extraction IA : taille des morceaux envoyés, recouvrement entre morceaux et requêtes simultanées
+AI_CHUNK_CHARS = int(os.getenv("AI_CHUNK_CHARS", "10000"))
+AI_CHUNK_OVERLAP = 500
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "4"))
+
+# Déclencheurs des phrases porteuses de règles, repérés par le composant « rule_triggers »
+RULE_TRIGGER_PHRASES = ["si", "alors", "est tenu de", "ne peut pas", "est obligatoire", "a le droit de", "est autorisé à"]
+# Verbes reconnus sous toutes leurs formes (doit, doivent, devra... ; peut entraîner, entraînera...)
+RULE_TRIGGER_LEMMAS = {"devoir": ["doit"], "entraîner": ["entraîne"], "provoquer": ["provoque"]}
+# Débuts de mots couvrant les formes de ces verbes, pour le préfiltre des phrases candidates
+RULE_TRIGGER_STEMS = ["doi", "dev", "dû", "entraîn", "provoqu"]
+RULE_TRIGGERS_KEY = "rule_triggers"
+# Étapes dont le pipeline se termine par le composant « rule_triggers »
+RULE_TRIGGER_STAGES = ("full", "document")
+
+# Analyse spaCy : taille maximale d'un morceau (bien en deçà de nlp.max_length), processus et taille des lots
+NLP_CHUNK_CHARS = int(os.getenv("NLP_CHUNK_CHARS", "100000"))
+NLP_PROCESSES = int(os.getenv("NLP_PROCESSES", "1"))
+NLP_BATCH_SIZE = int(os.getenv("NLP_BATCH_SIZE", "64"))
+# En dessous de ce nombre de morceaux, le démarrage des processus coûte plus qu'il ne rapporte
+NLP_PARALLEL_MIN_CHUNKS = int(os.getenv("NLP_PARALLEL_MIN_CHUNKS", "32"))
+
+# Mode optionnel : un seul processus local héberge le modèle pour tous les processus Streamlit
+# (adresse « hôte:port » ou chemin de socket Unix, et clé d'authentification partagée).
+# Le worker peut être lancé à part (python App.py nlp-worker) ; sinon le premier processus Streamlit le démarre.
+NLP_WORKER_ADDRESS = os.getenv("NLP_WORKER_ADDRESS")
+NLP_WORKER_AUTHKEY = os.getenv("NLP_WORKER_AUTHKEY", "")
+NLP_WORKER_START_TIMEOUT = 30.0
+# Nombre maximal de requêtes en attente regroupées dans un même passage nlp.pipe
+NLP_WORKER_MAX_REQUESTS = 32
+
 # ----------------------------
 # FONCTIONS UTILITAIRES
 # ----------------------------
 
+def _config_items(node):
+    """Parcourt récursivement les paires (clé, valeur) d'une section de configuration spaCy"""
+    for key, value in node.items():
+        yield key, value
+        if isinstance(value, dict):
+            yield from _config_items(value)
+
+def _component_uses(config, name, key, predicate):
+    return any(k == key and predicate(v) for k, v in _config_items(config["components"].get(name, {})))
+
+def _stage_components(stage, meta, config):
+    """
+    Composants à activer pour une étape, d'après la méta-description et la configuration du modèle.
+    Le parser remplace le senter si le modèle n'en a pas ; tok2vec est conservé si un composant l'écoute.
+    """
+    available = meta.get("components") or meta.get("pipeline", [])
+    wanted = [name for name in NLP_STAGES[stage] if name in available]
+    if "senter" in NLP_STAGES[stage] and "senter" not in available and "parser" in available:
+        wanted.append("parser")
+    if "tok2vec" in available and "tok2vec" not in wanted:
+        if any(_component_uses(config, name, "@architectures", lambda v: "Tok2VecListener" in str(v)) for name in wanted):
+            wanted.insert(0, "tok2vec")
+    return [name for name in available if name in wanted]
+
+def _model_data_dir():
+    """Répertoire des données du modèle (meta.json, config.cfg), installé comme paquet ou indiqué par un chemin"""
+    if spacy.util.is_package(NLP_MODEL_NAME):
+        package_path = spacy.util.get_package_path(NLP_MODEL_NAME)
+        meta = spacy.util.get_model_meta(package_path)
+        return package_path / f"{meta['lang']}_{meta['name']}-{meta['version']}"
+    path = Path(NLP_MODEL_NAME)
+    if not (path / "config.cfg").exists():
+        raise OSError(f"Modèle {NLP_MODEL_NAME} introuvable")
+    return path
+
+@Language.factory(RULE_TRIGGERS_KEY)
+def make_rule_triggers(nlp, name):
+    """
+    Composant spaCy qui repère en un seul passage les déclencheurs de règles (RULE_TRIGGER_PHRASES,
+    RULE_TRIGGER_LEMMAS) et les range dans doc.spans["rule_triggers"], sérialisé avec la Doc (DocBin).
+    Les motifs sont compilés une fois, à l'ajout du composant au modèle partagé.
+    """
+    phrase_matcher = PhraseMatcher(nlp.vocab, attr="LOWER")
+    phrase_matcher.add(RULE_TRIGGERS_KEY, list(nlp.tokenizer.pipe(RULE_TRIGGER_PHRASES)))
+    matcher = Matcher(nlp.vocab)
+    if "lemmatizer" in nlp.pipe_names:
+        matcher.add(RULE_TRIGGERS_KEY, [[{"LEMMA": lemma}] for lemma in RULE_TRIGGER_LEMMAS])
+    else:
+        # Sans lemmes, seules les formes usuelles sont reconnues
+        matcher.add(RULE_TRIGGERS_KEY, [[{"LOWER": form}] for forms in RULE_TRIGGER_LEMMAS.values() for form in forms])
+
+    def rule_triggers(doc):
+        matches = phrase_matcher(doc, as_spans=True) + matcher(doc, as_spans=True)
+        doc.spans[RULE_TRIGGERS_KEY] = sorted(matches, key=lambda span: (span.start, span.end))
+        return doc
+
+    return rule_triggers
+
+def _load_stage_pipeline(stage):
+    """Charge le modèle en excluant les composants inutiles à l'étape (ner, parser si un senter suffit...)"""
+    nlp = _load_model_components(stage)
+    if stage in RULE_TRIGGER_STAGES:
+        nlp.add_pipe(RULE_TRIGGERS_KEY, last=True)
+    return nlp
+
+def _load_model_components(stage):
+    if NLP_STAGES[stage] is None:
+        return spacy.load(NLP_MODEL_NAME)
+
+    data_dir = _model_data_dir()
+    meta = spacy.util.get_model_meta(data_dir)
+    config = spacy.util.load_config(data_dir / "config.cfg")
+    wanted = _stage_components(stage, meta, config)
+    excluded = [name for name in meta.get("components") or meta.get("pipeline", []) if name not in wanted]
+    nlp = spacy.load(NLP_MODEL_NAME, exclude=excluded, enable=wanted)
+
+    # Les vecteurs ne servent que si un composant conservé les utilise comme caractéristiques
+    if not any(_component_uses(config, name, "include_static_vectors", bool) for name in wanted):
+        nlp.vocab.reset_vectors(width=0)
+    return nlp
+
+def _load_nlp_with_install(stage):
+    """Charge le modèle d'une étape, après l'avoir téléchargé s'il n'est pas installé"""
+    try:
+        return _load_stage_pipeline(stage)
+    except OSError:
+        # Si le modèle n'est pas trouvé, tente l'installation
+        os.system(f"python -m spacy download {NLP_MODEL_NAME}")
+        return _load_stage_pipeline(stage)
+
+def _warm_up_nlp(state, stage):
+    """Chargement du modèle dans un thread d'arrière-plan ; aucun appel st.* ici"""
+    started = time.perf_counter()
+    try:
+        state["model"] = RemoteNLP(stage) if NLP_WORKER_ADDRESS else _load_nlp_with_install(stage)
+    except Exception as e:
+        state["error"] = str(e)
+    finally:
+        state["load_seconds"] = time.perf_counter() - started
+        state["ready"].set()
+
 @st.cache_resource
-def load_nlp_model():
-    """Charge le modèle spaCy pour le traitement NLP"""
+def nlp_model_state(stage="document"):
+    """
+    État du chargement du modèle spaCy d'une étape (voir NLP_STAGES), partagé par toutes les sessions du processus.
+    Le premier appel lance le chargement en arrière-plan ; les onglets consultent ensuite l'état sans attendre.
+    """
+    state = {"model": None, "error": None, "load_seconds": None, "ready": threading.Event()}
+    threading.Thread(target=_warm_up_nlp, args=(state, stage), daemon=True, name=f"nlp-{stage}").start()
+    return state
+
+def load_nlp_model(stage="document", wait=True):
+    """
+    Modèle spaCy d'une étape, restreint à ses composants. Par défaut, la vue « document » utilisée
+    par l'analyse partagée : sans ner ni parser. Renvoie None si le chargement a échoué
+    ou, avec wait=False, s'il n'est pas encore terminé.
+    """
+    state = nlp_model_state(stage)
+    if wait:
+        state["ready"].wait()
+    return state["model"]
+
+def _nlp_worker_address():
+    host, separator, port = NLP_WORKER_ADDRESS.rpartition(":")
+    return (host, int(port)) if separator and port.isdigit() else NLP_WORKER_ADDRESS
+
+def _serve_nlp_connection(connection, requests_queue):
+    """Relaie les requêtes d'un processus Streamlit vers la file du worker, puis lui renvoie les réponses"""
+    replies = queue.Queue()
+    with connection:
+        while True:
+            try:
+                request = connection.recv()
+            except (EOFError, OSError):
+                return
+            requests_queue.put((request, replies))
+            connection.send(replies.get())
+
+def _run_nlp_batches(requests_queue):
+    """
+    Boucle du modèle dans le worker : les requêtes arrivées entre-temps, quel que soit le processus
+    qui les envoie, sont regroupées et analysées en un seul passage nlp.pipe par étape.
+    """
+    models = {}
+    while True:
+        batch = [requests_queue.get()]
+        while len(batch) < NLP_WORKER_MAX_REQUESTS:
+            try:
+                batch.append(requests_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        pipes = {}
+        for request, replies in batch:
+            kind, stage = request[:2]
+            try:
+                if stage not in models:
+                    models[stage] = _load_nlp_with_install(stage)
+                if kind == "info":
+                    replies.put(("ok", (dict(models[stage].meta), models[stage].pipe_names)))
+                else:
+                    pipes.setdefault(stage, []).append((request[2], replies))
+            except Exception as e:
+                replies.put(("error", str(e)))
+
+        for stage, jobs in pipes.items():
+            try:
+                docs = list(models[stage].pipe([text for texts, _ in jobs for text in texts], batch_size=NLP_BATCH_SIZE))
+            except Exception as e:
+                for _, replies in jobs:
+                    replies.put(("error", str(e)))
+                continue
+            position = 0
+            for texts, replies in jobs:
+                replies.put(("ok", DocBin(docs=docs[position:position + len(texts)]).to_bytes()))
+                position += len(texts)
+
+def _nlp_worker_main(address, authkey):
+    """Processus worker NLP : accepte les connexions des processus Streamlit"""
     try:
-        # Essaye de charger le modèle normalement
-        nlp = spacy.load("fr_core_news_md")
-        st.success("Modèle NLP chargé avec succès !")
-        return nlp
+        listener = Listener(address, authkey=authkey)
     except OSError:
+        # Un autre processus Streamlit a démarré le worker au même moment
+        return
+    requests_queue = queue.Queue()
+    threading.Thread(target=_run_nlp_batches, args=(requests_queue,), daemon=True).start()
+    with listener:
+        while True:
+            try:
+                connection = listener.accept()
+            except (AuthenticationError, OSError):
+                continue
+            threading.Thread(target=_serve_nlp_connection, args=(connection, requests_queue), daemon=True).start()
+
+def _connect_nlp_worker():
+    """
+    Connexion au worker NLP. S'il ne répond pas encore, il est démarré comme processus indépendant
+    (nouvel interpréteur, nouvelle session) : pas de fork du serveur multithread, et il survit à l'arrêt
+    du processus Streamlit qui l'a lancé, dont les autres processus continuent de se servir.
+    """
+    if not NLP_WORKER_AUTHKEY:
+        raise ValueError("NLP_WORKER_AUTHKEY doit être défini avec NLP_WORKER_ADDRESS")
+    address = _nlp_worker_address()
+    authkey = NLP_WORKER_AUTHKEY.encode("utf-8")
+    try:
+        return Client(address, authkey=authkey)
+    except (ConnectionRefusedError, FileNotFoundError):
+        if isinstance(address, str):
+            # Socket Unix laissée par un worker arrêté
+            _remove_file(address)
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), "nlp-worker"], stdin=subprocess.DEVNULL,
+                         env=dict(os.environ, NLP_WORKER_ADDRESS=NLP_WORKER_ADDRESS, NLP_WORKER_AUTHKEY=NLP_WORKER_AUTHKEY),
+                         start_new_session=True)
+
+    deadline = time.monotonic() + NLP_WORKER_START_TIMEOUT
+    while True:
         try:
-            # Si le modèle n'est pas trouvé, propose l'installation
-            st.error("Modèle français non trouvé. Installation en cours...")
-            import os
-            os.system("python -m spacy download fr_core_news_md")
-            nlp = spacy.load("fr_core_news_md")
-            return nlp
-        except Exception as e:
-            st.error(f"Échec du chargement : {str(e)}")
-            return None
-    except Exception as e:
-        st.error(f"Erreur inattendue : {str(e)}")
-        return None
+            return Client(address, authkey=authkey)
+        except (ConnectionRefusedError, FileNotFoundError):
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+class RemoteNLP:
+    """
+    Mandataire d'un modèle spaCy hébergé par le worker NLP : fournit meta, pipe_names, vocab et pipe(),
+    seuls attributs utilisés par pipe_texts et parse_blocks. Les Doc reviennent sérialisées (DocBin)
+    et sont reconstruites sur le vocabulaire d'une langue vierge, sans charger le modèle dans ce processus.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self._lock = threading.Lock()
+        self._connection = None
+        self.meta, self.pipe_names = self._request("info", stage)
+        self.vocab = spacy.blank(self.meta.get("lang", "fr")).vocab
+
+    def _request(self, *request):
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._connection is None:
+                        self._connection = _connect_nlp_worker()
+                    self._connection.send(request)
+                    status, result = self._connection.recv()
+                    break
+                except (OSError, EOFError):
+                    # Worker redémarré : une nouvelle tentative sur une nouvelle connexion
+                    self._connection = None
+                    if attempt:
+                        raise
+        if status == "error":
+            raise RuntimeError(f"Worker NLP : {result}")
+        return result
+
+    def pipe(self, texts, n_process=1, batch_size=None):
+        # L'analyse se fait dans le worker ; n_process n'a pas d'effet côté client
+        texts = list(texts)
+        batch_size = batch_size or NLP_BATCH_SIZE
+        for start in range(0, len(texts), batch_size):
+            data = self._request("pipe", self.stage, texts[start:start + batch_size])
+            yield from DocBin().from_bytes(data).get_docs(self.vocab)
 
 import os
 import requests
@@ -108,58 +476,473 @@ def setup_azure_openai():
     return None
 
     
+def _azure_completion(prompt, client, model="gpt-4", temperature=0.7, max_tokens=1000):
+    """Appel brut à Azure OpenAI, sans affichage : utilisable depuis un thread, les erreurs sont levées"""
+    response = client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=temperature,
+        max_tokens=max_tokens
+    )
+    return response.choices[0].message.content.strip()
+
 def generate_with_azure_openai(prompt, client, model="gpt-4", temperature=0.7, max_tokens=1000):
     """Génère du texte avec Azure OpenAI"""
     try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=temperature,
-            max_tokens=max_tokens
-        )
-        return response.choices[0].message.content.strip()
+        return _azure_completion(prompt, client, model=model, temperature=temperature, max_tokens=max_tokens)
     except Exception as e:
         st.error(f"Erreur avec Azure OpenAI: {str(e)}")
         return None
 
-def extract_business_rules(text, nlp_model, use_ai=False):
+def _nlp_model_id(nlp_model):
+    """Identifiant du modèle NLP et de ses composants actifs pour les clés de cache (« regex » sans modèle)"""
+    if not nlp_model:
+        return "regex"
+    return (f"{nlp_model.meta.get('lang')}_{nlp_model.meta.get('name')}-{nlp_model.meta.get('version')}"
+            f"[{','.join(nlp_model.pipe_names)}]")
+
+def split_for_nlp(text, max_chars=None):
+    """
+    Découpe un texte en morceaux d'au plus max_chars caractères, de préférence entre paragraphes,
+    puis entre lignes, phrases ou mots. La concaténation des morceaux redonne exactement le texte.
+    """
+    max_chars = max_chars or NLP_CHUNK_CHARS
+    chunks = []
+    start = 0
+    while len(text) - start > max_chars:
+        window_end = start + max_chars
+        cut = window_end
+        for separator in ("\n\n", "\n", ". ", " "):
+            position = text.rfind(separator, start + 1, window_end)
+            if position > start:
+                cut = position + len(separator)
+                break
+        chunks.append(text[start:cut])
+        start = cut
+    chunks.append(text[start:])
+    return chunks
+
+def pipe_texts(texts, nlp_model, n_process=None, batch_size=None):
+    """
+    Analyse une liste de textes dans l'ordre avec nlp.pipe, sur plusieurs processus pour les gros volumes.
+    Les textes plus longs que NLP_CHUNK_CHARS sont découpés puis recomposés (Doc.from_docs), ce qui lève
+    la limite nlp.max_length sans changer le texte ni les positions des Doc produites.
+    """
+    chunked = [split_for_nlp(text) for text in texts]
+    flat = [chunk for chunks in chunked for chunk in chunks]
+    n_process = NLP_PROCESSES if n_process is None else n_process
+    if len(flat) < NLP_PARALLEL_MIN_CHUNKS or "fork" not in multiprocessing.get_all_start_methods():
+        n_process = 1
+    parsed = nlp_model.pipe(flat, n_process=n_process, batch_size=batch_size or NLP_BATCH_SIZE)
+
+    for chunks in chunked:
+        docs = [next(parsed) for _ in chunks]
+        yield docs[0] if len(docs) == 1 else Doc.from_docs(docs, ensure_whitespace=False)
+
+def _settings_digest(*settings):
+    """Empreinte de réglages (listes, dictionnaires de chaînes), pour les clés de cache qui en dépendent"""
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+def parse_blocks(blocks, nlp_model):
+    """
+    Analyse spaCy partagée par toutes les étapes (nettoyage, règles, PDC) : une Doc par bloc de texte.
+    Chaque Doc est sérialisée (DocBin) dans le cache disque, par empreinte du bloc et version du modèle ;
+    seuls les blocs jamais vus sont analysés, en un seul passage pipe_texts.
+    """
+    model_id = _nlp_model_id(nlp_model)
+    # Les Doc en cache portent les déclencheurs du composant « rule_triggers » : le vocabulaire fait partie de la clé
+    vocabulary = _settings_digest(RULE_TRIGGER_PHRASES, RULE_TRIGGER_LEMMAS)
+    keys = [hashlib.sha256(f"{block_hash}:{model_id}:{vocabulary}".encode("utf-8")).hexdigest()
+            for block_hash in block_hashes(blocks)]
+    docs = [None] * len(blocks)
+    missing = []
+    for i, key in enumerate(keys):
+        cached = cache_get("spacy", key)
+        if cached is None:
+            missing.append(i)
+        else:
+            docs[i] = next(DocBin().from_bytes(cached).get_docs(nlp_model.vocab))
+
+    for i, doc in zip(missing, pipe_texts([blocks[i] for i in missing], nlp_model)):
+        docs[i] = doc
+        cache_put("spacy", keys[i], DocBin(docs=[doc]).to_bytes())
+    return docs
+
+def parse_document(text, nlp_model, candidates_only=False):
+    """
+    Analyse partagée d'un document : liste de (position du bloc dans le texte, Doc du bloc).
+    Avec candidates_only, seuls les blocs contenant un mot déclencheur (has_trigger) sont analysés et renvoyés.
+    """
+    blocks = []
+    offsets = []
+    position = 0
+    for block in split_blocks(text):
+        if not candidates_only or has_trigger(block):
+            blocks.append(block)
+            offsets.append(position)
+        position += len(block)
+    return list(zip(offsets, parse_blocks(blocks, nlp_model)))
+
+@st.cache_resource
+def _rule_actions():
+    """Verbe d'action de chaque règle extraite par l'analyse partagée, réutilisé par generate_pdc_from_rule"""
+    return {}
+
+def _first_verb(tokens):
+    return next((token.text for token in tokens if token.pos_ == "VERB"), None)
+
+def _remember_rule_action(rule, tokens):
+    actions = _rule_actions()
+    if len(actions) > 100000:
+        actions.clear()
+    verb = _first_verb(tokens)
+    if verb:
+        actions.setdefault(rule, verb)
+
+def rule_action_verb(rule, nlp_model):
+    """Premier verbe d'une règle : issu de l'analyse du document si elle est connue, sinon de l'analyse de la règle seule"""
+    verb = _rule_actions().get(rule)
+    if verb is None and nlp_model:
+        verb = _first_verb(parse_blocks([rule], nlp_model)[0])
+    return verb
+
+RULE_PATTERNS = [
+    r"(Si|Lorsqu'|Quand|Dès que|En cas de).*?(alors|doit|devra|est tenu de|nécessite|implique|entraîne|peut).*?\.",
+    r"(Tout utilisateur|L'[a-zA-Z]+|Un client|Le système|Une demande).*?(doit|est tenu de|devra|ne peut pas|ne doit pas|est interdit de).*?\.",
+    r"(Le non-respect|Toute infraction|Une violation).*?(entraîne|provoque|peut entraîner|résulte en|sera soumis à).*?\.",
+    r"(L'utilisateur|Le client|Le prestataire|L'agent|Le système).*?(est autorisé à|peut|a le droit de).*?\."
+]
+
+PDC_PATTERNS = [
+    r"(Vérifier|S['']assurer|Contrôler|Vérification|Point de contrôle)\b.*?[\.;]",
+    r"(Le système doit|Il faut|Il est nécessaire de).*?(vérifier|contrôler|s'assurer)"
+]
+
+# Motifs compilés une fois pour toutes
+RULE_REGEXES = [re.compile(pattern, re.IGNORECASE) for pattern in RULE_PATTERNS]
+PDC_REGEXES = [re.compile(pattern, re.IGNORECASE) for pattern in PDC_PATTERNS]
+# Motifs du scanner unique, avec leur famille : les règles sont confinées aux segments de phrase
+SCAN_PATTERNS = [("rule", regex) for regex in RULE_REGEXES] + [("pdc", regex) for regex in PDC_REGEXES]
+# Segments de phrase : texte jusqu'au point inclus, sans traverser les retours à la ligne
+SENTENCE_SPAN_PATTERN = re.compile(r"[^.\n]+\.?")
+# Au-delà, un segment (dump de tableau, texte sans ponctuation) n'est pas soumis aux motifs :
+# le coût des .*? y croît plus que linéairement avec la longueur
+RULE_SEGMENT_MAX_CHARS = 2000
+
+def iter_sentence_spans(text):
+    """Produit (début, fin) de chaque segment de phrase soumis aux motifs de règles"""
+    for match in SENTENCE_SPAN_PATTERN.finditer(text):
+        if match.end() - match.start() <= RULE_SEGMENT_MAX_CHARS:
+            yield match.span()
+
+# Repliement de casse qui conserve les positions, aligné sur re.IGNORECASE pour les lettres des amorces
+SCAN_CASE_FOLD = str.maketrans({"İ": "i", "ı": "i", "ſ": "s", "K": "k"})
+
+def _top_level_groups(pattern):
+    """
+    Alternatives de chaque groupe de premier niveau d'un motif. Le premier groupe est l'amorce par laquelle
+    toute correspondance commence ; le dernier contient un mot que toute correspondance doit contenir.
+    """
+    depth = 0
+    in_class = False
+    groups = []
+    alternatives = []
+    start = 0
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\":
+            i += 2
+            continue
+        if in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "(":
+            depth += 1
+            if depth == 1:
+                alternatives = []
+                start = i + 1
+        elif char == "|" and depth == 1:
+            alternatives.append(pattern[start:i])
+            start = i + 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                groups.append(alternatives + [pattern[start:i]])
+        i += 1
+    if not groups or not pattern.startswith("("):
+        raise ValueError(f"Motif sans groupe initial : {pattern}")
+    return groups
+
+def _literal_prefixes(alternative):
+    """Préfixes littéraux (en minuscules) couvrant toutes les chaînes reconnues par une alternative"""
+    prefixes = [""]
+    i = 0
+    while i < len(alternative):
+        char = alternative[i]
+        if char == "[":
+            end = alternative.find("]", i + 1)
+            options = alternative[i + 1:end]
+            # Seules les classes de quelques caractères simples sont développées
+            if end < 0 or not options or len(options) > 4 or any(c in options for c in "\\-^"):
+                break
+            step = end + 1
+        elif char == "\\" and i + 1 < len(alternative) and not alternative[i + 1].isalnum():
+            options, step = alternative[i + 1], i + 2
+        elif char in "\\.^$*+?{}()|":
+            break
+        else:
+            options, step = char, i + 1
+        if step < len(alternative) and alternative[step] in "*+?{":
+            break
+        prefixes = [prefix + option.lower() for prefix in prefixes for option in dict.fromkeys(options)]
+        i = step
+    return prefixes
+
+def _trie_pattern(words):
+    """Alternative regex factorisée en arbre de préfixes : chaque position n'est examinée qu'une fois par caractère"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node):
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1:
+            body = branches[0]
+        elif all(len(branch) == 1 for branch in branches):
+            body = f"[{''.join(branches)}]"
+        else:
+            body = f"(?:{'|'.join(branches)})"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie)
+
+@st.cache_resource
+def _scan_starters(indices):
+    """
+    Préfixes littéraux des amorces de chaque motif indiqué (SCAN_PATTERNS), regex de toutes
+    les positions où l'un d'eux commence, et regex des mots requis par chaque motif (son dernier groupe),
+    à appliquer au texte replié en minuscules
+    """
+    prefixes = {i: tuple({prefix for alternative in _top_level_groups(SCAN_PATTERNS[i][1].pattern)[0]
+                          for prefix in _literal_prefixes(alternative)})
+                for i in indices}
+    gate = re.compile(f"(?={_trie_pattern({prefix for group in prefixes.values() for prefix in group})})")
+    required = {i: re.compile(_trie_pattern({prefix for alternative in _top_level_groups(SCAN_PATTERNS[i][1].pattern)[-1]
+                                             for prefix in _literal_prefixes(alternative)}))
+                for i in indices}
+    return prefixes, gate, required
+
+def _segment_limits(folded, segment, required):
+    """
+    Pour chaque motif de règle, position au-delà de laquelle il ne peut plus commencer dans le segment :
+    début de la dernière occurrence d'un mot requis, ou -1 si le segment n'en contient pas
+    ou ne se termine pas par le point que le motif exige.
+    """
+    start, end = segment
+    limits = {}
+    for i, regex in required.items():
+        family, pattern = SCAN_PATTERNS[i]
+        if family != "rule":
+            continue
+        limits[i] = -1
+        if pattern.pattern.endswith("\\.") and folded[end - 1] != ".":
+            continue
+        for hit in regex.finditer(folded, start, end):
+            limits[i] = hit.start()
+    return limits
+
+def _fold_case(text):
+    """Texte en minuscules aux mêmes positions que l'original, ou None si le repliement les décale"""
+    folded = text.translate(SCAN_CASE_FOLD).lower()
+    return folded if len(folded) == len(text) else None
+
+@st.cache_resource
+def trigger_regex():
+    """
+    Préfiltre : regex en arbre de préfixes sur le vocabulaire déclencheur commun aux règles et aux PDC,
+    à appliquer au texte en minuscules. Un mot requis par chaque motif (son dernier groupe) est cherché
+    tel quel, comme le ferait le motif ; les déclencheurs du composant « rule_triggers » sont cherchés
+    comme mots entiers, ou comme débuts de mots pour les formes des verbes.
+    """
+    required = {prefix for _, regex in SCAN_PATTERNS
+                for alternative in _top_level_groups(regex.pattern)[-1]
+                for prefix in _literal_prefixes(alternative)}
+    phrases = {phrase.lower() for phrase in RULE_TRIGGER_PHRASES}
+    return re.compile(f"{_trie_pattern(required)}|\\b(?:{_trie_pattern(phrases)})\\b|\\b(?:{_trie_pattern(RULE_TRIGGER_STEMS)})")
+
+def has_trigger(text):
+    """Vrai si le texte contient au moins un mot déclencheur de règle ou de PDC"""
+    folded = _fold_case(text)
+    if folded is None:
+        return re.compile(trigger_regex().pattern, re.IGNORECASE).search(text) is not None
+    return trigger_regex().search(folded) is not None
+
+def iter_candidate_spans(text):
+    """Segments de phrase (iter_sentence_spans) contenant au moins un mot déclencheur"""
+    folded = _fold_case(text)
+    regex = trigger_regex() if folded is not None else re.compile(trigger_regex().pattern, re.IGNORECASE)
+    hits = regex.finditer(folded if folded is not None else text)
+    hit = next(hits, None)
+    for start, end in iter_sentence_spans(text):
+        while hit is not None and hit.start() < start:
+            hit = next(hits, None)
+        if hit is not None and hit.start() < end:
+            yield start, end
+
+def skipped_fraction(text):
+    """Part du texte écartée par le préfiltre : hors de tout segment de phrase candidat"""
+    if not text:
+        return 0.0
+    return 1 - sum(end - start for start, end in iter_candidate_spans(text)) / len(text)
+
+def iter_pattern_matches(text, families=("rule", "pdc")):
+    """
+    Scanner unique des motifs de règles et de PDC : produit (famille, correspondance) en un seul parcours du texte.
+    Aux positions où commence l'amorce d'un motif, le motif est essayé en mode ancré, à partir de la fin
+    de sa correspondance précédente : on obtient exactement les correspondances de re.finditer motif par motif
+    (dans le segment de phrase pour les règles, sur tout le texte pour les PDC), ordonnées par position.
+    """
+    indices = tuple(i for i, (family, _) in enumerate(SCAN_PATTERNS) if family in families)
+    prefixes, gate, required = _scan_starters(indices)
+    folded = _fold_case(text)
+    if folded is None:
+        # Repliement qui décale les positions : amorces cherchées sans distinction de casse sur le texte d'origine
+        folded, gate, prefixes = text, re.compile(gate.pattern, re.IGNORECASE), None
+        required = {i: re.compile(regex.pattern, re.IGNORECASE) for i, regex in required.items()}
+    last_end = dict.fromkeys(indices, 0)
+    # Les segments sans mot déclencheur ne peuvent contenir aucune règle
+    segments = iter_candidate_spans(text)
+    segment = next(segments, None)
+    limits = None
+
+    for candidate in gate.finditer(folded):
+        position = candidate.start()
+        while segment is not None and segment[1] <= position:
+            segment = next(segments, None)
+            limits = None
+        in_segment = segment is not None and segment[0] <= position
+        for i in indices:
+            if position < last_end[i] or (prefixes and not folded.startswith(prefixes[i], position)):
+                continue
+            family, regex = SCAN_PATTERNS[i]
+            if family == "rule":
+                if not in_segment:
+                    continue
+                # Sans mot requis après l'amorce (ni point final), l'essai échouerait après avoir parcouru
+                # tout le segment : c'est ce qui rend quadratiques les segments pleins d'amorces
+                if limits is None:
+                    limits = _segment_limits(folded, segment, required)
+                if position >= limits[i]:
+                    continue
+                match = regex.match(text, position, segment[1])
+            else:
+                match = regex.match(text, position)
+            if match:
+                last_end[i] = match.end()
+                yield family, match
+
+def iter_rule_matches(text):
+    """
+    Produit (règle nettoyée, début, fin) pour chaque correspondance des motifs regex de règles.
+    Chaque correspondance est confinée à un segment de phrase candidat (iter_candidate_spans).
+    """
+    for _, match in iter_pattern_matches(text, families=("rule",)):
+        yield clean_rule(match.group()), match.start(), match.end()
+
+def find_rule_matches(text):
+    """
+    Applique les motifs regex de règles de gestion.
+    Les motifs ne traversent pas les retours à la ligne : le texte peut être traité par blocs de lignes complètes.
+    """
+    return [rule for rule, _, _ in iter_rule_matches(text)]
+
+def _rules_from_parsed(text, parsed, locations=None):
+    """
+    Règles d'un texte : motifs regex, puis phrases à déclencheur de son analyse spaCy [(position du bloc, Doc)].
+    locations, s'il est fourni, reçoit les positions de début de chaque règle dans text.
+    """
+    block_starts = [offset for offset, _ in parsed]
+    rules = set()
+    
+    for rule, start, end in iter_rule_matches(text):
+        rules.add(rule)
+        if locations is not None:
+            locations.setdefault(rule, []).append(start)
+        if parsed:
+            offset, doc = parsed[bisect_right(block_starts, start) - 1]
+            span = doc.char_span(start - offset, end - offset, alignment_mode="expand")
+            if span is not None:
+                _remember_rule_action(rule, span)
+    
+    # Extraction NLP si le modèle est disponible : phrases contenant un déclencheur repéré par le composant « rule_triggers »
+    for offset, doc in parsed:
+        triggered = {span.sent.start for span in doc.spans.get(RULE_TRIGGERS_KEY, [])}
+        for sent in doc.sents:
+            if sent.start in triggered:
+                if len(sent.text.split()) > 5:
+                    rule = clean_rule(sent.text)
+                    rules.add(rule)
+                    if locations is not None:
+                        locations.setdefault(rule, []).append(offset + sent.start_char)
+                    _remember_rule_action(rule, sent)
+    
+    return sorted(rules, key=lambda x: len(x), reverse=True)
+
+def extract_business_rules(text, nlp_model, use_ai=False, locations=None):
     """
-    Extrait les règles métier du texte avec option pour utiliser Azure OpenAI
+    Extrait les règles métier du texte avec option pour utiliser Azure OpenAI.
+    Sans IA, locations (dictionnaire facultatif) reçoit les positions de chaque règle dans le texte.
     """
     if not use_ai:
-        # Méthode originale avec regex et NLP
-        patterns = [
-            r"(Si|Lorsqu'|Quand|Dès que|En cas de).*?(alors|doit|devra|est tenu de|nécessite|implique|entraîne|peut).*?\.",
-            r"(Tout utilisateur|L'[a-zA-Z]+|Un client|Le système|Une demande).*?(doit|est tenu de|devra|ne peut pas|ne doit pas|est interdit de).*?\.",
-            r"(Le non-respect|Toute infraction|Une violation).*?(entraîne|provoque|peut entraîner|résulte en|sera soumis à).*?\.",
-            r"(L'utilisateur|Le client|Le prestataire|L'agent|Le système).*?(est autorisé à|peut|a le droit de).*?\."
-        ]
-        
-        rules = set()
-        
-        # Extraction par motifs regex
-        for pattern in patterns:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
-            for match in matches:
-                rules.add(clean_rule(match.group()))
-        
-        # Extraction NLP si le modèle est disponible
-        if nlp_model:
-            doc = nlp_model(text)
-            for sent in doc.sents:
-                if any(keyword in sent.text.lower() for keyword in ["si ", "alors", "doit", "est tenu de", "ne peut pas", "entraîne", "provoque",
-                "peut entraîner", "doit être", "est obligatoire", "a le droit de", "est autorisé à"]):
-                    if len(sent.text.split()) > 5:
-                        rules.add(clean_rule(sent.text))
-        
-        return sorted(rules, key=lambda x: len(x), reverse=True)
+        # Méthode originale avec regex et NLP, sur l'analyse spaCy partagée avec le nettoyage du texte ;
+        # les blocs sans mot déclencheur ne sont pas analysés
+        parsed = parse_document(text, nlp_model, candidates_only=True) if nlp_model else []
+        return _rules_from_parsed(text, parsed, locations)
     else:
-        # Méthode avec Azure OpenAI
+        # Méthode avec Azure OpenAI, sur l'ensemble du document découpé en morceaux
         client = setup_azure_openai()
         if not client:
             return []
-            
-        prompt = f"""
+        
+        rules, errors = extract_rules_with_ai(text, client)
+        for error in dict.fromkeys(errors):
+            st.error(f"Erreur avec Azure OpenAI: {error}")
+        return rules
+
+def split_for_ai(text, max_chars=None, overlap=None):
+    """
+    Découpe le document pour l'extraction IA : entre sections ou paragraphes de préférence, sinon entre lignes
+    ou phrases (split_for_nlp). Chaque morceau reprend la fin du précédent, à partir d'un début de phrase ou de
+    ligne, pour qu'une règle à cheval sur une coupure soit vue en entier.
+    """
+    max_chars = max_chars or AI_CHUNK_CHARS
+    overlap = AI_CHUNK_OVERLAP if overlap is None else overlap
+    chunks = []
+    start = 0
+    for piece in split_for_nlp(text, max_chars):
+        end = start + len(piece)
+        chunk_start = start
+        if start and overlap:
+            window = max(0, start - overlap)
+            sentence_end = text.find(". ", window, start)
+            line_end = text.find("\n", window, start)
+            starts = [position for position in (sentence_end + 2 if sentence_end >= 0 else None,
+                                                line_end + 1 if line_end >= 0 else None) if position is not None]
+            chunk_start = min(starts, default=start)
+        if piece.strip():
+            chunks.append(text[chunk_start:end])
+        start = end
+    return chunks
+
+def _rules_prompt(text):
+    return f"""
         Extrait les règles de gestion métier à partir du texte suivant en suivant ces consignes:
         1. Identifie toutes les règles fonctionnelles
         2. Formule-les de manière claire et concise
@@ -168,13 +951,79 @@ def extract_business_rules(text, nlp_model, use_ai=False):
         5. Retourne uniquement les règles, une par ligne
         
         Texte:
-        {text[:10000]}  # Limite pour éviter les tokens excessifs
+        {text}
         """
-        
-        result = generate_with_azure_openai(prompt, client)
-        if result:
-            return [clean_rule(rule) for rule in result.split('\n') if rule.strip()]
-        return []
+
+def _extract_chunk_rules(client, chunk):
+    """Règles d'un morceau du document ; exécuté dans un thread, donc sans appel st.*"""
+    result = _azure_completion(_rules_prompt(chunk), client)
+    return [clean_rule(rule) for rule in result.split('\n') if rule.strip()]
+
+def extract_rules_with_ai(text, client, max_workers=None):
+    """
+    Extraction IA de tout le document : les morceaux (split_for_ai) sont envoyés en parallèle, au plus
+    AI_MAX_CONCURRENCY requêtes à la fois, si bien que la durée totale est proche de celle du morceau
+    le plus lent. Les règles des morceaux sont fusionnées sans doublons exacts ; les quasi-doublons
+    des recouvrements sont laissés à collapse_near_duplicates, appliqué une seule fois par l'appelant
+    avec son seuil. Renvoie les règles et les erreurs des morceaux en échec.
+    """
+    rules = []
+    errors = []
+    chunks = split_for_ai(text)
+    if not chunks:
+        return rules, errors
+    with ThreadPoolExecutor(max_workers=min(max_workers or AI_MAX_CONCURRENCY, len(chunks)),
+                            thread_name_prefix="azure-openai") as executor:
+        futures = [executor.submit(_extract_chunk_rules, client, chunk) for chunk in chunks]
+        for future in as_completed(futures):
+            try:
+                rules.extend(future.result())
+            except Exception as e:
+                errors.append(str(e))
+    return sorted(set(rules), key=lambda x: len(x), reverse=True), errors
+
+def extract_business_rules_incremental(text, nlp_model, locations=None):
+    """
+    Extrait les règles bloc par bloc (pages ou paragraphes) en réutilisant celles des blocs
+    déjà analysés, par exemple les pages inchangées d'une révision précédente.
+    Le cache conserve les positions des règles dans leur bloc : locations (dictionnaire facultatif)
+    reçoit leurs positions dans le texte.
+    Renvoie les règles triées, le nombre de blocs effectivement analysés et celui des blocs
+    contenant un mot déclencheur (les autres ne peuvent contenir aucune règle).
+    """
+    rules = set()
+    analysed = 0
+    model_id = _nlp_model_id(nlp_model)
+    # Un cache des règles trouvé évite toute analyse : motifs et vocabulaire des déclencheurs font partie de la clé
+    vocabulary = _settings_digest(RULE_PATTERNS, RULE_TRIGGER_PHRASES, RULE_TRIGGER_LEMMAS, RULE_TRIGGER_STEMS)
+    blocks = split_blocks(text)
+    block_starts = [0]
+    for block in blocks[:-1]:
+        block_starts.append(block_starts[-1] + len(block))
+    # Un bloc sans mot déclencheur ne contient aucune règle : ni analyse ni entrée de cache
+    candidates = [i for i, block in enumerate(blocks) if has_trigger(block)]
+    keys = {i: hashlib.sha256(f"{block_hash}:{RULES_ENGINE_VERSION}:{model_id}:{vocabulary}".encode("utf-8")).hexdigest()
+            for i, block_hash in zip(candidates, block_hashes([blocks[i] for i in candidates]))}
+    # Règles de chaque bloc, avec leurs positions de début dans le bloc
+    block_rules = {}
+    for i in candidates:
+        cached = cache_get("rules", keys[i])
+        if cached is not None:
+            block_rules[i] = json.loads(cached)
+    missing = [i for i in candidates if i not in block_rules]
+    # Analyse groupée des blocs à traiter, transmise directement à l'extraction de chaque bloc
+    docs = parse_blocks([blocks[i] for i in missing], nlp_model) if nlp_model else [None] * len(missing)
+    for i, doc in zip(missing, docs):
+        block_rules[i] = {}
+        _rules_from_parsed(blocks[i], [(0, doc)] if doc is not None else [], block_rules[i])
+        cache_put("rules", keys[i], json.dumps(block_rules[i]).encode("utf-8"))
+        analysed += 1
+    for i in candidates:
+        rules.update(block_rules[i])
+        if locations is not None:
+            for rule, starts in block_rules[i].items():
+                locations.setdefault(rule, []).extend(block_starts[i] + start for start in starts)
+    return sorted(rules, key=lambda x: len(x), reverse=True), analysed, len(candidates)
 
 def clean_rule(rule_text):
     """Nettoie et formate une règle de gestion"""
@@ -183,21 +1032,847 @@ def clean_rule(rule_text):
         rule_text += '.'
     return rule_text
 
-def extract_text(uploaded_file):
-    """Extrait le texte depuis PDF ou DOCX"""
+def rule_shingles(rule):
+    """Ensemble des n-grammes de mots (RULE_SHINGLE_WORDS) d'une règle, en minuscules et sans ponctuation"""
+    words = re.findall(r"\w+", rule.lower())
+    if len(words) <= RULE_SHINGLE_WORDS:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + RULE_SHINGLE_WORDS]) for i in range(len(words) - RULE_SHINGLE_WORDS + 1)}
+
+def _minhash_signatures(shingle_sets):
+    """Signatures MinHash (MINHASH_BANDS × MINHASH_ROWS permutations) calculées avec NumPy"""
+    prime = (1 << 31) - 1
+    generator = np.random.default_rng(0)
+    size = MINHASH_BANDS * MINHASH_ROWS
+    a = generator.integers(1, prime, size, dtype=np.int64)[:, None]
+    b = generator.integers(0, prime, size, dtype=np.int64)[:, None]
+    signatures = np.full((len(shingle_sets), size), prime, dtype=np.int64)
+    for i, shingles in enumerate(shingle_sets):
+        if shingles:
+            hashes = np.array([zlib.crc32(shingle.encode("utf-8")) for shingle in shingles], dtype=np.int64) % prime
+            signatures[i] = ((a * hashes[None, :] + b) % prime).min(axis=1)
+    return signatures
+
+def _near_duplicate_candidates(shingle_sets):
+    """
+    Paires candidates : règles partageant une bande LSH de leur signature (variantes presque identiques),
+    ou partageant l'un des n-grammes les plus rares de la plus courte (inclusion d'un fragment dans une phrase)
+    """
+    candidates = set()
+    buckets = {}
+    signatures = _minhash_signatures(shingle_sets)
+    for i, signature in enumerate(signatures):
+        if not shingle_sets[i]:
+            continue
+        for band in range(MINHASH_BANDS):
+            key = (band, signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS].tobytes())
+            buckets.setdefault(key, []).append(i)
+
+    for members in buckets.values():
+        for position, i in enumerate(members):
+            for j in members[position + 1:]:
+                candidates.add((i, j))
+
+    postings = {}
+    for i, shingles in enumerate(shingle_sets):
+        for shingle in shingles:
+            postings.setdefault(shingle, []).append(i)
+    for i, shingles in enumerate(shingle_sets):
+        for shingle in sorted(shingles, key=lambda shingle: len(postings[shingle]))[:CONTAINMENT_RARE_SHINGLES]:
+            candidates.update((min(i, j), max(i, j)) for j in postings[shingle] if j != i)
+    return candidates
+
+def collapse_near_duplicates(rules, threshold=None):
+    """
+    Regroupe les règles presque identiques ou incluses les unes dans les autres (fragment regex
+    d'une phrase retenue par le NLP, par exemple) et ne garde que la plus longue de chaque groupe.
+    Les paires candidates (MinHash/LSH, n-grammes rares) sont vérifiées sur les n-grammes exacts.
+    """
+    threshold = RULE_DEDUP_THRESHOLD if threshold is None else threshold
+    rules = sorted(set(rules), key=lambda x: (-len(x), x))
+    shingle_sets = [rule_shingles(rule) for rule in rules]
+    parent = list(range(len(rules)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in _near_duplicate_candidates(shingle_sets):
+        first, second = shingle_sets[i], shingle_sets[j]
+        if len(first & second) / min(len(first), len(second)) >= threshold:
+            # Les règles sont triées par longueur décroissante : la racine reste la plus longue
+            root_i, root_j = find(i), find(j)
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    return [rule for i, rule in enumerate(rules) if find(i) == i]
+
+def cache_get(namespace, key):
+    """Lit une entrée du cache disque, ou None si elle est absente"""
+    path = os.path.join(CACHE_DIR, namespace, key)
     try:
-        file_bytes = uploaded_file.getvalue()
-        
-        if uploaded_file.type == "application/pdf":
-            with BytesIO(file_bytes) as f:
-                text = pdfminer.high_level.extract_text(f)
-        elif uploaded_file.type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-            with BytesIO(file_bytes) as f:
-                doc = docx.Document(f)
-                text = "\n".join([p.text for p in doc.paragraphs if p.text.strip()])
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    try:
+        # La date de modification sert d'horodatage LRU
+        os.utime(path, None)
+    except OSError:
+        pass
+    return data
+
+def cache_put(namespace, key, data):
+    """Écrit une entrée dans le cache disque de manière atomique puis applique l'éviction"""
+    directory = os.path.join(CACHE_DIR, namespace)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, os.path.join(directory, key))
+    except OSError:
+        return
+    # L'éviction parcourt tout le cache : on la limite lors des rafales d'écritures (cache par bloc)
+    if time.monotonic() - _eviction_state["last"] >= CACHE_EVICTION_INTERVAL:
+        _eviction_state["last"] = time.monotonic()
+        evict_cache()
+
+_eviction_state = {"last": 0.0}
+
+def evict_cache(max_bytes=None):
+    """Supprime les entrées les moins récemment utilisées jusqu'à repasser sous la taille max"""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    try:
+        for namespace in os.scandir(CACHE_DIR):
+            if not namespace.is_dir():
+                continue
+            for entry in os.scandir(namespace.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    except OSError:
+        return
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            # Déjà supprimée par un autre processus
+            pass
+        total -= size
+
+def _extraction_cache_key(data, file_type, **settings):
+    """Clé de cache : empreinte du contenu (bytes ou mmap), version de l'extracteur et paramètres"""
+    digest = hashlib.sha256(data)
+    digest.update(json.dumps({"version": EXTRACTOR_VERSION, "type": file_type, **settings},
+                             sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+def spool_to_temp_file(uploaded_file):
+    """Copie un fichier téléversé par blocs dans un fichier temporaire ; l'appelant doit le supprimer"""
+    suffix = os.path.splitext(uploaded_file.name)[1] if getattr(uploaded_file, "name", None) else ""
+    uploaded_file.seek(0)
+    with tempfile.NamedTemporaryFile(prefix="cdc_upload_", suffix=suffix, delete=False) as tmp:
+        shutil.copyfileobj(uploaded_file, tmp, SPOOL_BLOCK_SIZE)
+    return tmp.name
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+@contextmanager
+def spooled_upload(uploaded_file):
+    """Copie un fichier téléversé dans un fichier temporaire le temps du bloc et renvoie son chemin"""
+    path = spool_to_temp_file(uploaded_file)
+    try:
+        yield path
+    finally:
+        _remove_file(path)
+
+@contextmanager
+def map_file(path):
+    """Projette un fichier en mémoire en lecture seule : les pages sont lues à la demande, sans copie"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError("Document vide")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+def _current_rss():
+    """Mémoire résidente actuelle du processus en octets (Linux), ou None"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _maxrss_bytes(who):
+    """Pic de mémoire résidente rapporté par getrusage, en octets"""
+    maxrss = resource.getrusage(who).ru_maxrss
+    # Linux renvoie des kilo-octets, macOS des octets
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+@contextmanager
+def measure_peak_rss(stats, interval=0.05):
+    """
+    Mesure le pic de mémoire résidente pendant le bloc et le consigne dans stats (en Mo).
+    La mémoire du processus est échantillonnée ; les pools de processus partagés, jamais terminés
+    entre deux extractions, ne sont pas comptés.
+    """
+    start_rss = _current_rss()
+    peak = [start_rss or 0]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(interval):
+            rss = _current_rss()
+            if rss:
+                peak[0] = max(peak[0], rss)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    if start_rss is not None:
+        sampler.start()
+    start_time = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        done.set()
+        if sampler.is_alive():
+            sampler.join()
+        stats["seconds"] = time.perf_counter() - start_time
+        if start_rss is not None:
+            peak[0] = max(peak[0], _current_rss() or 0)
+            stats["start_rss_mb"] = start_rss / 2**20
+            stats["peak_rss_mb"] = peak[0] / 2**20
+        elif resource:
+            stats["peak_rss_mb"] = _maxrss_bytes(resource.RUSAGE_SELF) / 2**20
+
+def _process_pool_context():
+    """
+    Contexte des pools de processus partagés : forkserver (spawn à défaut), jamais de fork du serveur
+    Streamlit multithread, dont un verrou pourrait être copié verrouillé. Les processus importent
+    le script hors de `streamlit run`, comme benchmarks.py, puis sont réutilisés.
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return multiprocessing.get_context(method)
+
+@st.cache_resource
+def pdf_process_pool():
+    """Pool de processus partagé pour les plages de pages PDF : au plus PDF_WORKERS processus pour tout le serveur"""
+    return ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=_process_pool_context())
+
+def _discard_broken_pool(pool_function, pool):
+    """Oublie un pool dont un processus a disparu (mémoire épuisée...) : le prochain appel en recrée un"""
+    pool.shutdown(wait=False)
+    # Une autre session peut l'avoir déjà remplacé
+    if pool_function() is pool:
+        pool_function.clear()
+
+def _imap_in_processes(func, jobs, workers):
+    """
+    Exécute func(*job) pour chaque job dans le pool de processus partagé et renvoie les résultats dans l'ordre,
+    au fil de l'eau. Au plus workers jobs de cet appel sont soumis à la fois.
+    """
+    jobs = iter(jobs)
+    pool = pdf_process_pool()
+    futures = []
+    try:
+        for job in jobs:
+            futures.append(pool.submit(func, *job))
+            if len(futures) >= workers:
+                break
+        while futures:
+            result = futures.pop(0).result()
+            job = next(jobs, None)
+            if job is not None:
+                futures.append(pool.submit(func, *job))
+            yield result
+    except BrokenProcessPool:
+        _discard_broken_pool(pdf_process_pool, pool)
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+
+def _iter_pdf_pages(fp, page_numbers=None, maxpages=0, profile=None):
+    """Décode un PDF page par page, comme pdfminer.high_level.extract_text (chaque page se termine par un saut de page)"""
+    laparams = LAParams(**PDF_PROFILES[profile or PDF_PROFILE])
+    rsrcmgr = PDFResourceManager(caching=True)
+    output = StringIO()
+    device = TextConverter(rsrcmgr, output, laparams=laparams)
+    interpreter = PDFPageInterpreter(rsrcmgr, device)
+    try:
+        for page in PDFPage.get_pages(fp, page_numbers, maxpages=maxpages, caching=True):
+            interpreter.process_page(page)
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+    finally:
+        device.close()
+
+def _extract_pdf_pages(path, page_numbers, profile):
+    """Extrait le texte d'une sélection de pages d'un PDF, une entrée par page"""
+    with map_file(path) as f:
+        return list(_iter_pdf_pages(f, page_numbers=set(page_numbers), profile=profile))
+
+def _stream_bytes(obj):
+    """Données brutes d'un flux PDF (sans décompression), ou b"" pour un autre objet"""
+    obj = resolve1(obj)
+    if not isinstance(obj, PDFStream):
+        return b""
+    return obj.rawdata if obj.rawdata is not None else obj.get_data()
+
+def _object_digest(obj, memo):
+    """
+    Empreinte récursive d'un objet PDF (dictionnaire, tableau, flux avec ses attributs), mémorisée
+    par référence indirecte : polices et formulaires partagés par plusieurs pages ne sont hachés qu'une fois.
+    """
+    if isinstance(obj, PDFObjRef):
+        if obj.objid not in memo:
+            # Marque provisoire : protège des références circulaires
+            memo[obj.objid] = f"ref{obj.objid}".encode("utf-8")
+            memo[obj.objid] = _object_digest(obj.resolve(), memo)
+        return memo[obj.objid]
+
+    digest = hashlib.sha256()
+    if isinstance(obj, PDFStream):
+        digest.update(b"stream")
+        digest.update(_object_digest(obj.attrs, memo))
+        digest.update(_stream_bytes(obj))
+    elif isinstance(obj, dict):
+        for key in sorted(obj, key=str):
+            # Le parent renvoie vers l'arbre des pages, sans effet sur le texte de la page
+            if key != "Parent":
+                digest.update(str(key).encode("utf-8"))
+                digest.update(_object_digest(obj[key], memo))
+    elif isinstance(obj, (list, tuple)):
+        digest.update(b"[")
+        for item in obj:
+            digest.update(_object_digest(item, memo))
+    else:
+        digest.update(repr(obj).encode("utf-8"))
+    return digest.digest()
+
+def pdf_page_fingerprints(path):
+    """
+    Empreinte de chaque page d'un PDF, calculée sans analyse de mise en page : dimensions et rotation,
+    flux de contenu, et polices (encodage, ToUnicode, largeurs, fichiers de police) et XObjects
+    (avec leurs propres ressources) référencés par la page.
+    """
+    fingerprints = []
+    memo = {}
+    with map_file(path) as f:
+        for page in PDFPage.get_pages(f):
+            digest = hashlib.sha256(f"{page.mediabox!r}:{page.rotate}".encode("utf-8"))
+            for stream in page.contents:
+                digest.update(_stream_bytes(stream))
+            resources = resolve1(page.resources) or {}
+            for kind in ("Font", "XObject"):
+                digest.update(kind.encode("utf-8"))
+                digest.update(_object_digest(resources.get(kind, {}), memo))
+            fingerprints.append(digest.hexdigest())
+    return fingerprints
+
+def _page_cache_key(fingerprint, profile):
+    return hashlib.sha256(f"{fingerprint}:{EXTRACTOR_VERSION}:{profile or PDF_PROFILE}".encode("utf-8")).hexdigest()
+
+def iter_pdf_chunks(path, workers=None, profile=None):
+    """
+    Produit le texte d'un PDF page par page, dans l'ordre.
+    Les pages déjà extraites (même empreinte, par exemple dans une révision précédente du document)
+    proviennent du cache ; les autres sont décodées, en parallèle par lots si elles sont nombreuses.
+    """
+    try:
+        fingerprints = pdf_page_fingerprints(path)
+    except Exception:
+        # Structure inhabituelle : extraction complète sans cache par page
+        with map_file(path) as f:
+            yield from _iter_pdf_pages(f, profile=profile)
+        return
+
+    cached = [cache_get("page", _page_cache_key(fingerprint, profile)) for fingerprint in fingerprints]
+    missing = [i for i, page in enumerate(cached) if page is None]
+
+    workers = PDF_WORKERS if workers is None else workers
+    if not missing:
+        extracted = iter(())
+    elif workers > 1 and len(missing) >= PDF_PARALLEL_MIN_PAGES:
+        # Plusieurs lots par processus pour lisser les pages lourdes ; chaque processus projette le fichier
+        batch_size = max(1, len(missing) // (workers * 4))
+        jobs = [(path, missing[start:start + batch_size], profile) for start in range(0, len(missing), batch_size)]
+        extracted = (page for pages in _imap_in_processes(_extract_pdf_pages, jobs, min(workers, len(jobs)))
+                     for page in pages)
+    else:
+        def extract_missing():
+            with map_file(path) as f:
+                yield from _iter_pdf_pages(f, page_numbers=set(missing), profile=profile)
+        extracted = extract_missing()
+
+    for fingerprint, page in zip(fingerprints, cached):
+        if page is not None:
+            yield page.decode("utf-8")
+            continue
+        text = next(extracted)
+        cache_put("page", _page_cache_key(fingerprint, profile), text.encode("utf-8"))
+        yield text
+
+def extract_pdf_text(path, workers=None, profile=None):
+    """Extrait le texte d'un PDF ; avec le profil « balanced », identique à une extraction pdfminer en un seul appel"""
+    return "".join(iter_pdf_chunks(path, workers=workers, profile=profile))
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+def _iter_ooxml_paragraphs(stream):
+    """
+    Parcourt un flux WordprocessingML (corps, en-tête ou pied de page) avec un parseur incrémental
+    et produit le texte de chaque paragraphe, y compris ceux des cellules de tableau, dans l'ordre du document.
+    """
+    paragraphs = []
+    run_depth = 0
+    # Le contenu mc:Fallback duplique celui de mc:Choice (zones de texte)
+    fallback_depth = 0
+    for event, elem in ElementTree.iterparse(stream, events=("start", "end")):
+        tag = elem.tag
+        if tag == MC_FALLBACK:
+            fallback_depth += 1 if event == "start" else -1
+            continue
+        if fallback_depth:
+            if event == "end":
+                elem.clear()
+            continue
+
+        if event == "start":
+            if tag == W_NS + "p":
+                paragraphs.append([])
+            elif tag == W_NS + "r":
+                run_depth += 1
+            continue
+
+        if tag == W_NS + "t":
+            if paragraphs:
+                paragraphs[-1].append(elem.text or "")
+        elif run_depth and tag == W_NS + "tab":
+            paragraphs[-1].append("\t")
+        elif run_depth and tag in (W_NS + "br", W_NS + "cr"):
+            paragraphs[-1].append("\n")
+        elif tag == W_NS + "r":
+            run_depth -= 1
+        elif tag == W_NS + "p":
+            yield "".join(paragraphs.pop())
+            elem.clear()
+        elif tag == W_NS + "tbl":
+            elem.clear()
+
+def _docx_part_order(name):
+    """Tri naturel des parties header1.xml, header2.xml, ..., header10.xml"""
+    number = re.search(r"(\d+)\.xml$", name)
+    return int(number.group(1)) if number else 0
+
+def _iter_docx_paragraphs(path):
+    """
+    Produit les paragraphes non vides d'un DOCX, séparés par des retours à la ligne :
+    en-têtes, corps du document (paragraphes et tableaux) puis pieds de page.
+    """
+    with zipfile.ZipFile(path) as archive:
+        names = archive.namelist()
+        headers = sorted((n for n in names if re.fullmatch(r"word/header\d*\.xml", n)), key=_docx_part_order)
+        footers = sorted((n for n in names if re.fullmatch(r"word/footer\d*\.xml", n)), key=_docx_part_order)
+
+        separator = ""
+        for part in headers + ["word/document.xml"] + footers:
+            with archive.open(part) as stream:
+                for text in _iter_ooxml_paragraphs(stream):
+                    if text.strip():
+                        yield separator + text
+                        separator = "\n"
+
+def _document_cache_key(mapped, file_type, profile):
+    """Clé de cache du texte d'un document ; le profil d'analyse ne concerne que les PDF"""
+    if file_type == "application/pdf":
+        return _extraction_cache_key(mapped, file_type, profile=profile or PDF_PROFILE)
+    return _extraction_cache_key(mapped, file_type)
+
+def _iter_txt_chunks(path):
+    """Produit le contenu d'un fichier texte (UTF-8, ou Windows-1252 à défaut) avec des fins de ligne normalisées"""
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        text = data.decode("cp1252", errors="replace")
+    yield text.replace("\r\n", "\n").replace("\r", "\n")
+
+def iter_document_chunks(path, file_type, workers=None, profile=None):
+    """
+    Produit le texte d'un document au fur et à mesure du décodage (pages PDF, paragraphes DOCX).
+    La concaténation des morceaux est le texte complet, mis en cache une fois l'extraction terminée.
+    """
+    with map_file(path) as mapped:
+        cache_key = _document_cache_key(mapped, file_type, profile)
+    cached = cache_get("text", cache_key)
+    if cached is not None:
+        yield from (page for page in re.split(r"(?<=\f)", cached.decode("utf-8")) if page)
+        return
+
+    if file_type == "application/pdf":
+        chunks = iter_pdf_chunks(path, workers=workers, profile=profile)
+    elif file_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
+        chunks = _iter_docx_paragraphs(path)
+    elif file_type == "text/plain":
+        chunks = _iter_txt_chunks(path)
+    else:
+        raise ValueError("Format non supporté")
+
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    cache_put("text", cache_key, "".join(parts).encode("utf-8"))
+
+def extract_document_text(path, file_type, workers=None, profile=None):
+    """Extrait le texte brut d'un document, via le cache disque si le même contenu a déjà été extrait"""
+    return "".join(iter_document_chunks(path, file_type, workers=workers, profile=profile))
+
+def extract_document_preview(path, file_type, pages=PREVIEW_PAGES, profile=None):
+    """
+    Texte des premières pages d'un document pour l'aperçu, sans attendre l'extraction complète.
+    Renvoie aussi un booléen indiquant si le texte complet était déjà en cache.
+    """
+    with map_file(path) as mapped:
+        cached = cache_get("text", _document_cache_key(mapped, file_type, profile))
+    if cached is not None:
+        return cached.decode("utf-8"), True
+
+    if file_type == "application/pdf":
+        with map_file(path) as f:
+            return "".join(_iter_pdf_pages(f, maxpages=pages, profile=profile)), False
+
+    preview = ""
+    if file_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
+        for chunk in _iter_docx_paragraphs(path):
+            preview += chunk
+            if len(preview) >= PREVIEW_CHARS:
+                break
+    elif file_type == "text/plain":
+        preview = "".join(_iter_txt_chunks(path))[:PREVIEW_CHARS]
+    return preview, False
+
+@st.cache_resource
+def background_executor():
+    """Pool de threads partagé pour les extractions complètes lancées en arrière-plan"""
+    return ThreadPoolExecutor(max_workers=BACKGROUND_WORKERS, thread_name_prefix="extraction")
+
+def _extract_and_remove(path, file_type, profile):
+    """Extraction complète d'un fichier temporaire, supprimé une fois l'extraction terminée"""
+    try:
+        return extract_document_text(path, file_type, profile=profile)
+    finally:
+        _remove_file(path)
+
+def start_background_extraction(uploaded_file, profile=None):
+    """Lance l'extraction complète en arrière-plan et renvoie l'aperçu des premières pages"""
+    path = spool_to_temp_file(uploaded_file)
+    try:
+        preview, complete = extract_document_preview(path, uploaded_file.type, profile=profile)
+    except Exception:
+        _remove_file(path)
+        raise
+    if complete:
+        _remove_file(path)
+        return preview, None
+    return preview, background_executor().submit(_extract_and_remove, path, uploaded_file.type, profile)
+
+def resolve_pending_text():
+    """Publie le texte complet dans la session dès que l'extraction en arrière-plan est terminée. Renvoie True si elle est toujours en cours."""
+    future = st.session_state.get("text_future")
+    if future is None:
+        return False
+    if not future.done():
+        return True
+
+    del st.session_state["text_future"]
+    try:
+        text = future.result()
+    except Exception as e:
+        st.error(f"Erreur d'extraction : {str(e)}")
+        return False
+    if text and text.strip():
+        set_document_text(text)
+    return False
+
+@st.cache_resource
+def batch_process_pool():
+    """Pool de processus partagé pour les extractions par lots : au plus BATCH_WORKERS processus pour tout le serveur"""
+    return ProcessPoolExecutor(max_workers=BATCH_WORKERS, mp_context=_process_pool_context())
+
+def iter_batch_extraction(uploaded_files, profile=None):
+    """
+    Extrait plusieurs documents en parallèle, au plus BATCH_WORKERS à la fois pour tout le serveur.
+    Produit (position du fichier, texte, erreur) au fur et à mesure : l'échec d'un fichier n'interrompt pas les autres.
+    """
+    paths = {}
+    # Future -> (position du fichier, pool qui l'exécute)
+    futures = {}
+    interrupted = []
+
+    def submit(i):
+        pool = batch_process_pool()
+        # Le processus du pool ne crée pas lui-même d'autres processus : une seule plage de pages
+        try:
+            future = pool.submit(extract_document_text, paths[i], uploaded_files[i].type, 1, profile)
+        except BrokenProcessPool:
+            # Pool cassé par un lot précédent : recréé pour ce fichier et les suivants
+            _discard_broken_pool(batch_process_pool, pool)
+            pool = batch_process_pool()
+            future = pool.submit(extract_document_text, paths[i], uploaded_files[i].type, 1, profile)
+        futures[future] = (i, pool)
+        return future
+
+    try:
+        for i, uploaded_file in enumerate(uploaded_files):
+            try:
+                paths[i] = spool_to_temp_file(uploaded_file)
+                submit(i)
+            except Exception as e:
+                yield i, None, str(e)
+        for future in as_completed(list(futures)):
+            i, pool = futures[future]
+            try:
+                yield i, future.result(), None
+            except BrokenProcessPool:
+                _discard_broken_pool(batch_process_pool, pool)
+                interrupted.append(i)
+            except Exception as e:
+                yield i, None, str(e)
+        # Un processus disparu (mémoire épuisée...) fait échouer tout son pool : les fichiers concernés sont
+        # repris un par un, pour que seul celui qui l'a provoqué échoue
+        for i in interrupted:
+            try:
+                future = submit(i)
+                text = future.result()
+            except BrokenProcessPool:
+                _discard_broken_pool(batch_process_pool, futures[future][1])
+                yield i, None, "processus d'extraction interrompu (mémoire insuffisante ?)"
+            except Exception as e:
+                yield i, None, str(e)
+            else:
+                yield i, text, None
+    finally:
+        for future in futures:
+            future.cancel()
+        for path in paths.values():
+            _remove_file(path)
+
+def combine_documents(documents):
+    """Assemble plusieurs textes en un corpus ; chaque document commence sur une nouvelle page"""
+    parts = []
+    for name, text in documents:
+        if parts and not parts[-1].endswith("\f"):
+            parts.append("\n\f")
+        parts.append(f"Document : {name}\n\n")
+        parts.append(text)
+    return "".join(parts)
+
+def iter_text_chunks(uploaded_file, workers=None, profile=None):
+    """
+    Version incrémentale de extract_text : produit le texte morceau par morceau.
+    Une erreur en cours d'extraction remonte à l'appelant, qui ne doit pas publier le texte partiel.
+    """
+    with spooled_upload(uploaded_file) as path:
+        yield from iter_document_chunks(path, uploaded_file.type, workers=workers, profile=profile)
+
+def iter_line_blocks(chunks):
+    """Regroupe des morceaux de texte en blocs de lignes complètes (aucune ligne n'est coupée entre deux blocs)"""
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        cut = pending.rfind("\n")
+        if cut >= 0:
+            yield pending[:cut + 1]
+            pending = pending[cut + 1:]
+    if pending:
+        yield pending
+
+# Titres numérotés (« 3.2 Gestion des comptes ») ou intitulés (« Article 4 - ... », « CHAPITRE II »)
+HEADING_PATTERN = re.compile(
+    r"^[ \t\f]*(?:\d+(?:\.\d+)*\.?[ \t]+[A-ZÀ-Ý]|(?:ARTICLE|Article|CHAPITRE|Chapitre|ANNEXE|Annexe)\b)[^\n]{0,120}$",
+    re.MULTILINE
+)
+
+class DocumentIndex(NamedTuple):
+    """Index structurel d'un texte extrait : positions (en caractères) des pages, sections et paragraphes"""
+    page_starts: array
+    section_starts: array
+    section_titles: list
+    paragraph_starts: array
+    paragraph_ends: array
+
+def build_document_index(text):
+    """
+    Construit l'index structurel d'un texte extrait.
+    Les pages sont délimitées par les sauts de page de pdfminer ; les paragraphes par des lignes vides
+    quand le texte en contient (PDF), sinon par les retours à la ligne (un paragraphe DOCX par ligne).
+    """
+    page_starts = array("L", [0])
+    page_starts.extend(m.end() for m in re.finditer(r"\f", text) if m.end() < len(text))
+
+    section_starts = array("L")
+    section_titles = []
+    for m in HEADING_PATTERN.finditer(text):
+        title = m.group().strip()
+        if not title.endswith("."):
+            section_starts.append(m.start() + len(m.group()) - len(m.group().lstrip()))
+            section_titles.append(title)
+
+    paragraph_pattern = r"[^\n\f]+(?:\n[^\n\f]+)*" if "\n\n" in text else r"[^\n\f]+"
+    paragraph_starts = array("L")
+    paragraph_ends = array("L")
+    for m in re.finditer(paragraph_pattern, text):
+        if m.group().strip():
+            paragraph_starts.append(m.start())
+            paragraph_ends.append(m.end())
+
+    return DocumentIndex(page_starts, section_starts, section_titles, paragraph_starts, paragraph_ends)
+
+def locate_offset(index, offset):
+    """Page (à partir de 1), titre de section et numéro de paragraphe contenant une position du texte"""
+    section = bisect_right(index.section_starts, offset) - 1
+    return {
+        "page": bisect_right(index.page_starts, offset),
+        "section": index.section_titles[section] if section >= 0 else None,
+        "paragraph": max(bisect_right(index.paragraph_starts, offset) - 1, 0),
+    }
+
+def find_rule_location(text, index, rule):
+    """
+    Retrouve l'emplacement d'une règle (texte normalisé par clean_rule) en cherchant son début dans le document source.
+    Réservé aux règles sans position connue (extraction IA) : des règles au début identique y ont le même emplacement.
+    """
+    words = rule.rstrip(".").split()[:12]
+    if not words:
+        return None
+    match = re.search(r"\s+".join(map(re.escape, words)), text)
+    return locate_offset(index, match.start()) if match else None
+
+def rule_location(rule):
+    """
+    Emplacement d'une règle dans le texte de la session : sa première position relevée à l'extraction
+    (rule_locations), sinon la recherche de find_rule_location. Renvoie aussi le nombre d'autres occurrences.
+    """
+    if "text_index" not in st.session_state:
+        return None, 0
+    starts = sorted(set(st.session_state.get("rule_locations", {}).get(rule, [])))
+    if starts:
+        return locate_offset(st.session_state.text_index, starts[0]), len(starts) - 1
+    return find_rule_location(st.session_state.text, st.session_state.text_index, rule), 0
+
+def format_location(location):
+    """Libellé court d'un emplacement : « p. 12 · 3.2 Gestion des comptes »"""
+    if not location:
+        return ""
+    label = f"p. {location['page']}"
+    if location["section"]:
+        label += f" · {location['section']}"
+    return label
+
+def set_document_text(text):
+    """Publie un texte extrait et son index structurel dans la session"""
+    # Une extraction en arrière-plan encore en cours (aperçu rapide d'un autre document) n'écrasera pas ce texte
+    st.session_state.pop("text_future", None)
+    st.session_state.text = text
+    st.session_state.text_index = build_document_index(text)
+
+class ChangeSet(NamedTuple):
+    """Différences entre deux révisions d'un document, en positions de blocs (pages PDF ou paragraphes)"""
+    added: list
+    removed: list
+    modified: list
+    unchanged: list
+
+def split_blocks(text):
+    """Découpe un texte en blocs stables d'une révision à l'autre : pages si le texte en contient, lignes sinon"""
+    if "\f" in text:
+        return [block for block in re.split(r"(?<=\f)", text) if block]
+    return text.splitlines(keepends=True)
+
+def block_hashes(blocks):
+    return [hashlib.blake2b(block.encode("utf-8"), digest_size=16).hexdigest() for block in blocks]
+
+def compute_change_set(previous_hashes, hashes):
+    """
+    Compare les empreintes de blocs de deux révisions.
+    Les positions de removed se rapportent à la révision précédente, les autres à la nouvelle.
+    """
+    added, removed, modified, unchanged = [], [], [], []
+    matcher = difflib.SequenceMatcher(None, previous_hashes, hashes, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            unchanged.extend(range(j1, j2))
+        elif tag == "replace":
+            paired = min(i2 - i1, j2 - j1)
+            modified.extend(range(j1, j1 + paired))
+            added.extend(range(j1 + paired, j2))
+            removed.extend(range(i1 + paired, i2))
+        elif tag == "insert":
+            added.extend(range(j1, j2))
         else:
-            raise ValueError("Format non supporté")
-            
+            removed.extend(range(i1, i2))
+    return ChangeSet(added, removed, modified, unchanged)
+
+def revision_scope():
+    """
+    Portée des révisions : le projet saisi dans l'onglet Extraction, partagé entre les sessions pour qu'une
+    révision téléversée plus tard soit comparée à la précédente ; à défaut, la session, pour que deux
+    utilisateurs ne comparent pas leurs fichiers homonymes.
+    """
+    project = st.session_state.get("revision_project", "").strip()
+    if project:
+        return f"projet:{project}"
+    if "revision_scope" not in st.session_state:
+        st.session_state.revision_scope = uuid.uuid4().hex
+    return st.session_state.revision_scope
+
+def record_revision(name, text, scope):
+    """
+    Enregistre les empreintes de blocs d'un document sous son nom de fichier, dans une portée (revision_scope),
+    et renvoie les changements par rapport à la révision précédente ; None pour une première version
+    ou un document inchangé. Le ChangeSet n'est qu'informatif : la réutilisation des résultats des blocs
+    inchangés vient des caches par empreinte de contenu (pages, analyses spaCy, règles), quelle que soit la portée.
+    """
+    key = hashlib.sha256(f"{scope}:{name}".encode("utf-8")).hexdigest()
+    previous = cache_get("revision", key)
+    hashes = block_hashes(split_blocks(text))
+    cache_put("revision", key, json.dumps(hashes).encode("utf-8"))
+    if previous is None:
+        return None
+    change_set = compute_change_set(json.loads(previous), hashes)
+    if not (change_set.added or change_set.removed or change_set.modified):
+        return None
+    return change_set
+
+def describe_change_set(change_set):
+    """Résumé lisible d'un ChangeSet"""
+    return (f"{len(change_set.modified)} blocs modifiés, {len(change_set.added)} ajoutés, "
+            f"{len(change_set.removed)} supprimés, {len(change_set.unchanged)} inchangés")
+
+def extract_text(uploaded_file, workers=None, profile=None):
+    """Extrait le texte depuis PDF ou DOCX"""
+    try:
+        with spooled_upload(uploaded_file) as path:
+            text = extract_document_text(path, uploaded_file.type, workers=workers, profile=profile)
         return text if text and text.strip() else None
         
     except Exception as e:
@@ -217,36 +1892,93 @@ def create_rules_document(rules):
     buffer.seek(0)
     return buffer
 
-def clean_text(text, nlp_model, min_word_length=3):
+# Catégories grammaticales écartées par le nettoyage
+CLEAN_EXCLUDED_POS = ["DET", "ADP", "CCONJ", "PRON", "PART"]
+CLEAN_EXCLUDED_POS_IDS = np.array([POS_IDS[pos] for pos in CLEAN_EXCLUDED_POS], dtype=np.uint64)
+# Normalisation des lemmes (minuscules, ponctuation retirée)
+LEMMA_STRIP_PATTERN = re.compile(r"[^\w\sàâäéèêëîïôöùûüç]")
+# Moteurs de nettoyage : analyse spaCy complète, ou table de lemmes et tokenisation regex (« fast »)
+CLEAN_ENGINES = ["spacy", "fast"]
+FAST_TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+def _clean_doc_lemmas(doc, min_word_length):
+    """
+    Lemmes conservés d'une Doc, filtrés en bloc sur les attributs des tokens (doc.to_array) plutôt que token par token.
+    Seuls les lemmes des tokens retenus sont convertis en chaînes, une fois par lemme distinct.
+    """
+    attributes = doc.to_array([IS_STOP, IS_PUNCT, IS_SPACE, POS, LENGTH, LEMMA])
+    if not len(attributes):
+        return []
+    keep = (
+        (attributes[:, 0] == 0) &
+        (attributes[:, 1] == 0) &
+        (attributes[:, 2] == 0) &
+        ~np.isin(attributes[:, 3], CLEAN_EXCLUDED_POS_IDS) &
+        (attributes[:, 4] >= min_word_length)
+    )
+    lemma_ids, positions = np.unique(attributes[keep, 5], return_inverse=True)
+
+    # Même normalisation que l'ancien pré-traitement du texte (minuscules, ponctuation retirée)
+    strings = doc.vocab.strings
+    lemmas = [LEMMA_STRIP_PATTERN.sub(" ", strings[int(lemma_id)].lower()).strip()
+              for lemma_id in lemma_ids]
+    return [lemmas[i] for i in positions if lemmas[i]]
+
+@st.cache_resource
+def lemma_lookup_table():
+    """
+    Table forme → lemme précalculée du lemmatiseur du modèle, lue sur disque sans charger le pipeline
+    (à défaut, celle du paquet facultatif spacy-lookups-data). OSError si aucune n'est disponible.
+    """
+    try:
+        lookups_dir = _model_data_dir() / "lemmatizer" / "lookups"
+    except OSError:
+        # Modèle non installé
+        lookups_dir = None
+    if lookups_dir is not None and lookups_dir.exists():
+        lookups = Lookups().from_disk(lookups_dir)
+        if lookups.has_table("lemma_lookup"):
+            return lookups.get_table("lemma_lookup")
+    try:
+        return load_lookups("fr", ["lemma_lookup"]).get_table("lemma_lookup")
+    except (ImportError, ValueError, KeyError) as e:
+        raise OSError(f"Table de lemmes introuvable : installer le modèle {NLP_MODEL_NAME} "
+                      "(requirements.txt) ou le paquet spacy-lookups-data") from e
+
+def _fast_clean_lemmas(text, min_word_length):
+    """Nettoyage sans étiqueteur : tokens regex, mots vides et longueur filtrés, lemmes issus de la table"""
+    table = lemma_lookup_table()
+    lemmas = {}
+    cleaned_tokens = []
+    for token in FAST_TOKEN_PATTERN.findall(text.lower()):
+        if len(token) < min_word_length or token in STOP_WORDS:
+            continue
+        lemma = lemmas.get(token)
+        if lemma is None:
+            lemma = lemmas[token] = LEMMA_STRIP_PATTERN.sub(" ", table.get(token, token).lower()).strip()
+        if lemma:
+            cleaned_tokens.append(lemma)
+    return cleaned_tokens
+
+def clean_text(text, nlp_model, min_word_length=3, engine="spacy"):
     """
     Nettoyage approfondi du texte avec :
     - Suppression des stopwords
     - Lemmatisation
     - Filtrage par catégorie grammaticale
     - Suppression des mots trop courts
+    Le texte n'est pas ré-analysé : les tokens proviennent de l'analyse partagée du document.
+    Avec engine="fast", table de lemmes et tokenisation regex, sans étiqueteur ni filtrage
+    grammatical (nlp_model n'est pas utilisé), pour les gros corpus.
     """
+    if engine == "fast":
+        return " ".join(_fast_clean_lemmas(text, min_word_length)) if text else ""
     if not text or not nlp_model:
         return ""
     
-    # Nettoyage de base
-    text = text.lower()
-    text = re.sub(r"[^\w\sàâäéèêëîïôöùûüç]", " ", text)
-    text = re.sub(r"\s+", " ", text).strip()
-    
-    # Traitement NLP
-    doc = nlp_model(text)
     cleaned_tokens = []
-    
-    for token in doc:
-        if (token.is_stop or 
-            token.is_punct or 
-            len(token.text) < min_word_length or
-            token.pos_ in ["DET", "ADP", "CCONJ", "PRON", "PART"]):
-            continue
-            
-        lemma = token.lemma_.strip()
-        if lemma:
-            cleaned_tokens.append(lemma)
+    for _, doc in parse_document(text, nlp_model):
+        cleaned_tokens.extend(_clean_doc_lemmas(doc, min_word_length))
     
     return " ".join(cleaned_tokens)
 
@@ -255,6 +1987,46 @@ def calculate_frequencies(text):
     words = [word for word in text.split() if len(word) > 2]
     return pd.Series(words).value_counts()
 
+@st.cache_resource
+def _cleaning_results():
+    """Résultats du nettoyage déjà calculés dans ce processus, par clé de cache"""
+    return {}
+
+def _cleaning_cache_key(text, nlp_model, min_word_length, engine):
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    if engine == "fast":
+        settings = f"fast:{NLP_MODEL_NAME}"
+    else:
+        settings = f"{_nlp_model_id(nlp_model)}:{','.join(CLEAN_EXCLUDED_POS)}"
+    return hashlib.sha256(f"{text_hash}:{min_word_length}:{settings}".encode("utf-8")).hexdigest()
+
+def analyse_text(text, nlp_model, min_word_length=3, engine="spacy"):
+    """
+    Texte nettoyé et fréquences des mots, mis en cache par empreinte du texte, longueur minimale,
+    moteur, modèle et catégories grammaticales filtrées : en mémoire pour les réexécutions du script,
+    sur disque (espace « clean ») pour les autres processus et redémarrages.
+    """
+    key = _cleaning_cache_key(text, nlp_model, min_word_length, engine)
+    results = _cleaning_results()
+    if key in results:
+        return results[key]
+
+    cached = cache_get("clean", key)
+    if cached is not None:
+        data = json.loads(cached)
+        text_clean = data["text"]
+        freq = pd.Series(data["counts"], index=data["words"], name="count", dtype="int64")
+    else:
+        text_clean = clean_text(text, nlp_model, min_word_length, engine=engine)
+        freq = calculate_frequencies(text_clean)
+        data = {"text": text_clean, "words": freq.index.tolist(), "counts": freq.tolist()}
+        cache_put("clean", key, json.dumps(data).encode("utf-8"))
+
+    if len(results) > 64:
+        results.clear()
+    results[key] = text_clean, freq
+    return text_clean, freq
+
 def generate_wordcloud(freq_dict, width=800, height=400, background_color="white", colormap="viridis"):
     """Génère un nuage de mots"""
     fig, ax = plt.subplots(figsize=(10, 5))
@@ -270,33 +2042,32 @@ def generate_wordcloud(freq_dict, width=800, height=400, background_color="white
     ax.axis("off")
     return fig
 
+def iter_pdc_matches(text):
+    """Produit (PDC, début) pour chaque correspondance des motifs regex de PDC"""
+    for _, match in iter_pattern_matches(text, families=("pdc",)):
+        pdc = match.group().strip()
+        if len(pdc.split()) > 3:
+            if not pdc.endswith('.'):
+                pdc += '.'
+            yield pdc, match.start()
+
+def find_pdc_matches(text):
+    """Applique les motifs regex de PDC ; comme pour les règles, un bloc de lignes complètes suffit"""
+    return [pdc for pdc, _ in iter_pdc_matches(text)]
+
 def extract_pdc_from_text(text):
     """Extrait les exigences PDC d'un texte"""
-    patterns = [
-        r"(Vérifier|S['']assurer|Contrôler|Vérification|Point de contrôle)\b.*?[\.;]",
-        r"(Le système doit|Il faut|Il est nécessaire de).*?(vérifier|contrôler|s'assurer)"
-    ]
-    pdc_list = set()
-    for pattern in patterns:
-        matches = re.finditer(pattern, text, re.IGNORECASE)
-        for match in matches:
-            pdc = match.group().strip()
-            if len(pdc.split()) > 3:
-                if not pdc.endswith('.'):
-                    pdc += '.'
-                pdc_list.add(pdc)
-    return sorted(pdc_list, key=lambda x: len(x), reverse=True)
+    return sorted(set(find_pdc_matches(text)), key=lambda x: len(x), reverse=True)
 
 def generate_pdc_from_rule(rule, use_ai=False):
     """Génère un PDC à partir d'une règle de gestion"""
-    if not use_ai or 'nlp' not in st.session_state:
-        if 'nlp' not in st.session_state:
-            st.error("Modèle NLP non chargé")
+    if not use_ai:
+        # Pas d'attente du chargement en arrière-plan : formulation par défaut tant que le modèle n'est pas prêt
+        nlp_model = load_nlp_model(wait=False)
+        if not nlp_model:
             return f"Vérifier que {rule}"
         
-        doc = st.session_state.nlp(rule)
-        verbs = [token.text for token in doc if token.pos_ == "VERB"]
-        action = verbs[0] if verbs else "vérifier"
+        action = rule_action_verb(rule, nlp_model) or "vérifier"
         return f"{action.capitalize()} que {rule}"
     else:
         client = setup_azure_openai()
@@ -408,42 +2179,200 @@ def create_pdc_document(pdc_list):
     buffer.seek(0)
     return buffer
 
+# Worker NLP partagé lancé comme processus à part : python App.py nlp-worker
+if __name__ == "__main__" and not streamlit_runtime.exists() and sys.argv[1:] == ["nlp-worker"]:
+    if not NLP_WORKER_ADDRESS or not NLP_WORKER_AUTHKEY:
+        sys.exit("NLP_WORKER_ADDRESS et NLP_WORKER_AUTHKEY doivent être définis")
+    _nlp_worker_main(_nlp_worker_address(), NLP_WORKER_AUTHKEY.encode("utf-8"))
+    sys.exit(0)
+
 # ----------------------------
 # INTERFACE UTILISATEUR
 # ----------------------------
 st.title("Générateur de Cas de Test avec Azure OpenAI")
+# Lance le chargement du modèle NLP dès la première exécution du script, sans bloquer l'affichage
+# (hors serveur Streamlit, par exemple à l'import par benchmarks.py, le modèle n'est chargé qu'à la demande)
+if streamlit_runtime.exists():
+    nlp_state = nlp_model_state()
+    if nlp_state["ready"].is_set() and nlp_state["model"]:
+        st.sidebar.metric("Chargement du modèle NLP", f"{nlp_state['load_seconds']:.1f} s")
 tab1, tab2, tab3, tab4, tab5 = st.tabs(["📤 Extraction", "🔍 Analyse", "☁️ WordCloud", "📜 Règles", "✅ PDC & Tests"])
+text_pending = resolve_pending_text()
+
+def wait_for_text_warning(key):
+    """Message affiché tant qu'aucun texte complet n'est disponible"""
+    if text_pending:
+        st.info("Extraction complète en cours en arrière-plan...")
+        # Le clic relance le script, qui vérifie à nouveau l'état de l'extraction
+        st.button("Actualiser", key=f"refresh_{key}")
+    else:
+        st.warning("Veuillez d'abord extraire un texte dans l'onglet 'Extraction'")
+
+def nlp_model_status(key):
+    """Modèle NLP s'il est prêt ; sinon affiche l'état du chargement et renvoie None"""
+    nlp_state = nlp_model_state()
+    if not nlp_state["ready"].is_set():
+        st.info("Chargement du modèle NLP en cours...")
+        st.button("Actualiser", key=f"refresh_nlp_{key}")
+    elif not nlp_state["model"]:
+        st.error(f"Échec du chargement du modèle NLP : {nlp_state['error']}")
+    return load_nlp_model(wait=False)
 
 with tab1:
     st.header("Extraction de Texte")
-    uploaded_file = st.file_uploader("Téléversez un document (PDF ou DOCX)", type=["pdf", "docx"])
+    uploaded_files = st.file_uploader("Téléversez un ou plusieurs documents (PDF, DOCX ou TXT)",
+                                      type=["pdf", "docx", "txt"], accept_multiple_files=True)
+    uploaded_file = uploaded_files[0] if len(uploaded_files) == 1 else None
+    
+    pdf_profile = st.selectbox("Profil d'analyse PDF", list(PDF_PROFILES), index=list(PDF_PROFILES).index(PDF_PROFILE),
+                               help="fast : ordre de lecture brut, le plus rapide · balanced : analyse par défaut · "
+                                    "accurate : texte vertical et texte des figures inclus")
+    fast_preview = st.checkbox(f"Aperçu rapide ({PREVIEW_PAGES} premières pages, extraction complète en arrière-plan)",
+                               value=False)
+    st.text_input("Projet (suivi des révisions)", key="revision_project",
+                  help="Les documents de même nom d'un même projet sont comparés à leur révision précédente, "
+                       "même téléversée lors d'une autre session")
+    
+    extract_clicked = bool(uploaded_files) and st.button("Extraire le texte")
+    if extract_clicked:
+        # Nouvelle extraction : l'aperçu rapide d'un document précédent ne doit plus publier son texte
+        st.session_state.pop("text_future", None)
+        text_pending = False
     
-    if uploaded_file and st.button("Extraire le texte"):
-        with st.spinner("Extraction en cours..."):
-            extracted_text = extract_text(uploaded_file)
+    if extract_clicked and len(uploaded_files) > 1:
+        st.subheader(f"Extraction de {len(uploaded_files)} documents")
+        overall = st.progress(0.0)
+        statuses = [st.empty() for _ in uploaded_files]
+        for status, f in zip(statuses, uploaded_files):
+            status.markdown(f"⏳ {f.name}")
+        
+        texts = [None] * len(uploaded_files)
+        failures = []
+        batch_start = time.perf_counter()
+        for done, (i, text, error) in enumerate(iter_batch_extraction(uploaded_files, profile=pdf_profile), 1):
+            name = uploaded_files[i].name
+            if error:
+                failures.append(name)
+                statuses[i].markdown(f"❌ {name} — {error}")
+            elif not text or not text.strip():
+                failures.append(name)
+                statuses[i].markdown(f"⚠️ {name} — aucun texte extrait")
+            else:
+                texts[i] = text
+                statuses[i].markdown(f"✅ {name} — {len(text)} caractères")
+            overall.progress(done / len(uploaded_files))
+        
+        # Corpus dans l'ordre de téléversement, quel que soit l'ordre de fin des extractions
+        documents = [(f.name, text) for f, text in zip(uploaded_files, texts) if text]
+        if documents:
+            set_document_text(combine_documents(documents))
+            st.success(f"{len(documents)} documents extraits en {time.perf_counter() - batch_start:.1f} s "
+                       f"({len(st.session_state.text)} caractères au total)")
             
-            if extracted_text:
-                st.session_state.text = extracted_text
-                st.success("Texte extrait avec succès !")
-                
-                with st.expander("Aperçu du texte"):
-                    st.text(extracted_text[:1000] + ("..." if len(extracted_text) > 1000 else ""))
+            for name, text in documents:
+                change_set = record_revision(name, text, revision_scope())
+                if change_set:
+                    st.caption(f"Nouvelle révision de {name} : {describe_change_set(change_set)}")
+        if failures:
+            st.warning(f"{len(failures)} document(s) non extrait(s) : {', '.join(failures)}")
+    
+    elif extract_clicked and fast_preview:
+        try:
+            preview_text, future = start_background_extraction(uploaded_file, profile=pdf_profile)
+        except Exception as e:
+            st.error(f"Erreur d'extraction : {str(e)}")
+        else:
+            # Les autres onglets attendent le texte complet
+            st.session_state.pop("text", None)
+            if future is None:
+                if preview_text.strip():
+                    set_document_text(preview_text)
+                    st.success("Texte extrait avec succès !")
+            else:
+                st.session_state.text_future = future
+                text_pending = True
+                st.info("Extraction complète en cours en arrière-plan : les onglets suivants seront disponibles dès qu'elle sera terminée.")
+            with st.expander("Aperçu du texte", expanded=True):
+                st.text(preview_text[:PREVIEW_CHARS] + ("..." if len(preview_text) > PREVIEW_CHARS else ""))
+    
+    elif extract_clicked:
+        with st.expander("Aperçu du texte", expanded=True):
+            preview = st.empty()
+        progress = st.empty()
+        candidates = st.empty()
+        
+        # Le texte est consommé au fil du décodage : aperçu et règles candidates s'affichent dès les premières pages
+        text_parts = []
+        extracted_length = 0
+        candidate_rules = set()
+        last_refresh = 0.0
+        extraction_stats = {}
+        extraction_error = None
+        with st.spinner("Extraction en cours..."), measure_peak_rss(extraction_stats):
+            try:
+                for block in iter_line_blocks(iter_text_chunks(uploaded_file, profile=pdf_profile)):
+                    text_parts.append(block)
+                    extracted_length += len(block)
+                    candidate_rules.update(find_rule_matches(block))
+                    
+                    if time.monotonic() - last_refresh > 0.5:
+                        last_refresh = time.monotonic()
+                        if extracted_length - len(block) < 1000:
+                            preview.text("".join(text_parts)[:1000])
+                        progress.caption(f"{extracted_length} caractères extraits · {len(candidate_rules)} règles candidates")
+                        candidates.info(max(candidate_rules, key=len) if candidate_rules else "Recherche de règles...")
+            except Exception as e:
+                extraction_error = e
+        
+        extracted_text = "".join(text_parts)
+        progress.empty()
+        candidates.empty()
+        if extraction_error is not None:
+            # Extraction interrompue : le texte partiel n'est ni publié ni enregistré comme révision
+            preview.empty()
+            st.error(f"Erreur d'extraction : {str(extraction_error)}")
+        elif extracted_text.strip():
+            set_document_text(extracted_text)
+            index = st.session_state.text_index
+            st.success(f"Texte extrait avec succès ! ({len(candidate_rules)} règles candidates détectées)")
+            st.caption(f"{len(index.page_starts)} pages · {len(index.section_starts)} sections · "
+                       f"{len(index.paragraph_starts)} paragraphes")
+            
+            change_set = record_revision(uploaded_file.name, extracted_text, revision_scope())
+            if change_set:
+                st.info(f"Nouvelle révision de {uploaded_file.name} : {describe_change_set(change_set)}")
+            preview.text(extracted_text[:1000] + ("..." if len(extracted_text) > 1000 else ""))
+        else:
+            preview.empty()
+        
+        if "peak_rss_mb" in extraction_stats:
+            st.caption(
+                f"Fichier de {uploaded_file.size / 2**20:.1f} Mo extrait en {extraction_stats['seconds']:.1f} s · "
+                f"pic mémoire du processus : {extraction_stats['peak_rss_mb']:.0f} Mo"
+                + (f" (+{extraction_stats['peak_rss_mb'] - extraction_stats['start_rss_mb']:.0f} Mo)"
+                   if "start_rss_mb" in extraction_stats else "")
+            )
 
 with tab2:
     if 'text' not in st.session_state:
-        st.warning("Veuillez d'abord extraire un texte dans l'onglet 'Extraction'")
+        wait_for_text_warning("analyse")
     else:
-        nlp_model = load_nlp_model()
-        if not nlp_model:
-            st.error("Modèle NLP non disponible pour le nettoyage")
-        else:
-            with st.spinner("Nettoyage approfondi en cours..."):
-                st.session_state.text_clean = clean_text(st.session_state.text, nlp_model)
-                st.session_state.freq = calculate_frequencies(st.session_state.text_clean)
-            
-            st.subheader("Fréquence des mots (nettoyés)")
-            top_n = st.slider("Nombre de mots à afficher", 5, 50, 20)
-            st.dataframe(st.session_state.freq.head(top_n))
+        clean_engine = st.radio("Moteur de nettoyage", CLEAN_ENGINES, horizontal=True,
+                                format_func=lambda engine: "spaCy (précis)" if engine == "spacy" else "Table de lemmes (rapide)")
+        nlp_model = nlp_model_status("analyse") if clean_engine == "spacy" else None
+        if nlp_model or clean_engine == "fast":
+            try:
+                with st.spinner("Nettoyage approfondi en cours..."):
+                    # Résultat mis en cache : le déplacement du curseur ne relance pas l'analyse
+                    st.session_state.text_clean, st.session_state.freq = analyse_text(st.session_state.text, nlp_model,
+                                                                                      engine=clean_engine)
+            except OSError as e:
+                # Moteur « fast » sans table de lemmes disponible
+                st.error(str(e))
+            else:
+                st.subheader("Fréquence des mots (nettoyés)")
+                top_n = st.slider("Nombre de mots à afficher", 5, 50, 20)
+                st.dataframe(st.session_state.freq.head(top_n))
 
 with tab3:
     st.header("Visualisation WordCloud")
@@ -483,22 +2412,41 @@ with tab3:
 
 with tab4:
     st.header("Extraction des Règles de Gestion")
-    nlp_model = load_nlp_model()
     
     # Option pour utiliser Azure OpenAI
     use_ai_rules = st.checkbox("Utiliser Azure OpenAI pour améliorer l'extraction", value=False)
+    dedup_threshold = st.slider("Seuil de regroupement des quasi-doublons", 0.5, 1.0, RULE_DEDUP_THRESHOLD, 0.05,
+                                help="Part des groupes de 3 mots de la règle la plus courte retrouvés dans l'autre")
     
     if 'text' not in st.session_state:
-        st.warning("Veuillez d'abord extraire un texte dans l'onglet 'Extraction'")
-    elif not nlp_model and not use_ai_rules:
-        st.error("Le traitement NLP n'est pas disponible")
-    else:
+        wait_for_text_warning("regles")
+    elif use_ai_rules or nlp_model_status("regles"):
+        nlp_model = load_nlp_model(wait=False)
         if st.button("Extraire les règles", type="primary"):
             with st.spinner("Analyse en cours (cela peut prendre quelques minutes)..."):
-                rules = extract_business_rules(st.session_state.text, nlp_model, use_ai=use_ai_rules)
+                # Positions exactes de chaque règle dans le texte (extraction sans IA)
+                rule_locations = {}
+                if use_ai_rules:
+                    rules = extract_business_rules(st.session_state.text, nlp_model, use_ai=True)
+                else:
+                    # Seuls les blocs jamais analysés (nouveaux ou modifiés depuis la révision précédente) sont traités
+                    rules, analysed_blocks, candidate_blocks = extract_business_rules_incremental(st.session_state.text,
+                                                                                                  nlp_model, rule_locations)
+                    if analysed_blocks < candidate_blocks:
+                        st.caption(f"{analysed_blocks} blocs analysés sur {candidate_blocks} contenant un mot déclencheur, "
+                                   "les autres réutilisent les résultats d'une révision précédente")
+                    st.caption(f"Préfiltre : {skipped_fraction(st.session_state.text):.0%} du texte écarté "
+                               "(phrases sans mot déclencheur)")
+                
+                # Fragments d'une même phrase et variantes presque identiques : seule la plus longue est conservée
+                extracted_count = len(rules)
+                rules = collapse_near_duplicates(rules, dedup_threshold)
+                if len(rules) < extracted_count:
+                    st.caption(f"{extracted_count - len(rules)} quasi-doublons regroupés")
                 
                 if rules:
                     st.session_state.rules = rules
+                    st.session_state.rule_locations = rule_locations
                     st.success(f"{len(rules)} règles identifiées !")
                     
                     st.subheader("Règles extraites")
@@ -514,6 +2462,10 @@ with tab4:
                     for i in range(start_idx, end_idx):
                         st.markdown(f"**Règle {i+1}**")
                         st.info(rules[i])
+                        location, other_occurrences = rule_location(rules[i])
+                        if location:
+                            st.caption(f"📍 {format_location(location)}"
+                                       + (f" (+{other_occurrences} autres occurrences)" if other_occurrences else ""))
                     
                     st.subheader("Export des résultats")
                     docx_file = create_rules_document(rules)
@@ -560,26 +2512,57 @@ with tab5:
             
             if pdc_file:
                 with st.spinner("Extraction des PDC en cours..."):
-                    pdc_text = extract_text(pdc_file)
-                    st.session_state.pdc_list = extract_pdc_from_text(pdc_text)
-                    
-                    if st.session_state.pdc_list:
-                        st.success(f"{len(st.session_state.pdc_list)} PDC extraits !")
-                        with st.expander("Aperçu des PDC"):
-                            for i, pdc in enumerate(st.session_state.pdc_list[:5], 1):
-                                st.markdown(f"{i}. {pdc}")
-                    else:
-                        st.warning("Aucun PDC détecté dans le document")
+                    pdc_progress = st.empty()
+                    # PDC -> première position dans le fichier PDC
+                    pdc_found = {}
+                    try:
+                        for block in iter_line_blocks(iter_text_chunks(pdc_file)):
+                            for pdc, start in iter_pdc_matches(block):
+                                pdc_found.setdefault(pdc, len(pdc_text) + start)
+                            pdc_text += block
+                            pdc_progress.caption(f"{len(pdc_found)} PDC détectés...")
+                    except Exception as e:
+                        # Extraction interrompue : aucun PDC n'est retenu du texte partiel
+                        pdc_progress.empty()
+                        st.error(f"Erreur d'extraction : {str(e)}")
                         st.session_state.pdc_list = []
+                        st.session_state.pdc_locations = {}
+                    else:
+                        pdc_progress.empty()
+                        st.session_state.pdc_list = sorted(pdc_found, key=lambda x: len(x), reverse=True)
+                        # Emplacement de chaque PDC importé dans son propre fichier
+                        pdc_index = build_document_index(pdc_text)
+                        st.session_state.pdc_locations = {
+                            pdc: f"{pdc_file.name} · {format_location(locate_offset(pdc_index, start))}"
+                            for pdc, start in pdc_found.items()
+                        }
+                        
+                        if st.session_state.pdc_list:
+                            st.success(f"{len(st.session_state.pdc_list)} PDC extraits !")
+                            with st.expander("Aperçu des PDC"):
+                                for i, pdc in enumerate(st.session_state.pdc_list[:5], 1):
+                                    st.markdown(f"{i}. {pdc}")
+                        else:
+                            st.warning("Aucun PDC détecté dans le document")
         
         # Section 2: Génération des PDC
         st.subheader("2. Génération des PDC")
         if has_pdc.startswith("Non") or (has_pdc.startswith("Oui") and pdc_file):
             if st.button("Générer/Compléter les PDC", type="primary"):
                 with st.spinner("Création des PDC..."):
+                    if not use_ai_pdc and not load_nlp_model(wait=False):
+                        st.warning("Modèle NLP indisponible ou en cours de chargement : formulation « Vérifier que » par défaut")
                     # Initialisation de la liste PDC
                     if 'pdc_list' not in st.session_state:
                         st.session_state.pdc_list = []
+                    if 'pdc_locations' not in st.session_state:
+                        st.session_state.pdc_locations = {}
+                    
+                    def add_generated_pdc(rule):
+                        # Un PDC généré hérite de l'emplacement de sa règle dans le document
+                        pdc = generate_pdc_from_rule(rule, use_ai=use_ai_pdc)
+                        st.session_state.pdc_list.append(pdc)
+                        st.session_state.pdc_locations.setdefault(pdc, format_location(rule_location(rule)[0]))
                     
                     # Pour les règles sans PDC correspondant
                     if has_pdc.startswith("Oui") and pdc_file:
@@ -588,11 +2571,13 @@ with tab5:
                         
                         for i, rule in enumerate(st.session_state.rules):
                             if similarity[i].max() < threshold:
-                                generated_pdc = generate_pdc_from_rule(rule, use_ai=use_ai_pdc)
-                                st.session_state.pdc_list.append(generated_pdc)
+                                add_generated_pdc(rule)
                     else:
                         # Génération automatique complète
-                        st.session_state.pdc_list = [generate_pdc_from_rule(rule, use_ai=use_ai_pdc) for rule in st.session_state.rules]
+                        st.session_state.pdc_list = []
+                        st.session_state.pdc_locations = {}
+                        for rule in st.session_state.rules:
+                            add_generated_pdc(rule)
                     
                     st.success(f"{len(st.session_state.pdc_list)} PDC prêts !")
         
@@ -611,6 +2596,9 @@ with tab5:
             for i in range(start_idx, end_idx):
                 st.markdown(f"**PDC {i+1}**")
                 st.info(st.session_state.pdc_list[i])
+                pdc_location = st.session_state.get("pdc_locations", {}).get(st.session_state.pdc_list[i])
+                if pdc_location:
+                    st.caption(f"📍 {pdc_location}")
             
             # Export PDC
             st.download_button(
@@ -629,22 +2617,25 @@ with tab5:
                     
                     for i, pdc in enumerate(st.session_state.pdc_list, 1):
                         is_manual = has_pdc.startswith("Oui") and i <= len(st.session_state.pdc_list)
-                        st.session_state.test_cases.append(create_test_case(pdc, i, is_manual, use_ai=use_ai_tests))
+                        test_case = create_test_case(pdc, i, is_manual, use_ai=use_ai_tests)
+                        # Emplacement source du PDC dont le cas de test est issu
+                        test_case["Source"] = st.session_state.get("pdc_locations", {}).get(pdc, "")
+                        st.session_state.test_cases.append(test_case)
                     
                     st.success(f"{len(st.session_state.test_cases)} cas de test générés !")
             
             # Affichage des Cas de Test
             if 'test_cases' in st.session_state:
                 df_test_cases = pd.DataFrame(st.session_state.test_cases)
-                st.dataframe(df_test_cases[["ID", "Type", "PDC", "Description"]])
+                st.dataframe(df_test_cases[["ID", "Type", "PDC", "Description", "Source"]])
                 
                 # Export des Cas de Test
                 test_cases_doc = Document()
                 test_cases_doc.add_heading('Cas de Test', level=1)
                 
-                table = test_cases_doc.add_table(rows=1, cols=5)
+                table = test_cases_doc.add_table(rows=1, cols=6)
                 table.style = 'Table Grid'
-                headers = ["ID", "Type", "PDC", "Description", "Étapes"]
+                headers = ["ID", "Type", "PDC", "Description", "Étapes", "Source"]
                 for i, header in enumerate(headers):
                     table.cell(0, i).text = header
                 
@@ -655,6 +2646,7 @@ with tab5:
                     row[2].text = case["PDC"]
                     row[3].text = case["Description"]
                     row[4].text = case["Étapes"]
+                    row[5].text = case["Source"]
                 
                 buffer = BytesIO()
                 test_cases_doc.save(buffer)
@@ -0,0 +1,496 @@
+"""
+Benchmarks de l'extraction et du traitement des CDC.
+
+Usage :
+    python benchmarks.py suite --sizes 10 100 1000 --output resultats.json --compare precedent.json
+    python benchmarks.py generate --pages 100 --output corpus/
+    python benchmarks.py docx --pages 500
+    python benchmarks.py profiles corpus/
+    python benchmarks.py nlp-scaling --pages 300 --max-processes 8
+    python benchmarks.py nlp-stages --pages 100
+    python benchmarks.py cleaning --pages 100 --corpus textes/
+    python benchmarks.py rules-adversarial --sizes 1000 4000 16000
+    python benchmarks.py scanner --pages 2000
+
+Le module App est importé hors de `streamlit run` : l'interface s'exécute en mode
+« bare » (avertissements Streamlit sans conséquence) et seules ses fonctions sont utilisées.
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from importlib import metadata
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+from docx import Document
+from pdfminer.pdfpage import PDFPage
+
+import App
+
+# ----------------------------
+# GÉNÉRATEUR DE CDC SYNTHÉTIQUES
+# ----------------------------
+
+SUBJECTS = ["le système", "l'utilisateur", "le client", "le prestataire", "l'agent", "le gestionnaire"]
+CONDITIONS = [
+    "le montant de la commande dépasse le plafond autorisé",
+    "le mot de passe est saisi trois fois de manière erronée",
+    "la demande de remboursement est incomplète",
+    "le délai de traitement excède cinq jours ouvrés",
+    "le compte client est suspendu",
+    "le fichier transmis ne respecte pas le format attendu",
+]
+ACTIONS = [
+    "bloquer la transaction en cours",
+    "envoyer une notification au responsable",
+    "conserver l'historique des opérations pendant dix ans",
+    "valider les pièces justificatives",
+    "afficher un message d'erreur explicite",
+    "journaliser la tentative de connexion",
+]
+RULE_TEMPLATES = [
+    "Si {condition}, alors {subject} doit {action}.",
+    "Lorsqu'{condition_elided}, {subject} devra {action}.",
+    "{Subject} est tenu de {action} avant toute validation.",
+    "{Subject} ne peut pas {action} sans accord préalable.",
+    "Le non-respect de cette exigence entraîne la suspension du service.",
+    "{Subject} est autorisé à {action} en cas de maintenance planifiée.",
+]
+FILLER_SENTENCES = [
+    "Le présent chapitre décrit le périmètre fonctionnel du lot.",
+    "Les écrans de consultation sont accessibles depuis le portail principal.",
+    "La volumétrie cible est estimée à dix mille dossiers par mois.",
+    "Les échanges avec le partenaire reposent sur des fichiers quotidiens.",
+]
+
+def _rule_sentence(rng):
+    subject = rng.choice(SUBJECTS)
+    condition = rng.choice(CONDITIONS)
+    return rng.choice(RULE_TEMPLATES).format(
+        condition=condition,
+        # « Lorsqu'il... » : élision devant le sujet de la condition
+        condition_elided="il apparaît que " + condition,
+        subject=subject,
+        Subject=subject[0].upper() + subject[1:],
+        action=rng.choice(ACTIONS),
+    )
+
+def generate_cdc(pages, seed=0, paragraphs_per_page=10):
+    """
+    Génère le contenu d'un cahier des charges synthétique en français : pour chaque page,
+    un titre numéroté, des paragraphes mêlant règles (« Si ... alors ... doit ... ») et texte descriptif,
+    et un tableau d'exigences.
+    """
+    rng = random.Random(seed)
+    content = []
+    for page in range(pages):
+        paragraphs = [_rule_sentence(rng) if rng.random() < 0.6 else rng.choice(FILLER_SENTENCES)
+                      for _ in range(paragraphs_per_page)]
+        table = [(f"EX-{page + 1:04d}-{row + 1}", _rule_sentence(rng)) for row in range(3)]
+        content.append({"title": f"{page + 1}. Exigences du lot {page + 1}", "paragraphs": paragraphs, "table": table})
+    return content
+
+CDC_HEADER = "Cahier des charges - Document de référence"
+CDC_FOOTER = "Confidentiel"
+
+def write_cdc_docx(path, content):
+    """Écrit un CDC synthétique en DOCX : en-tête, pied de page, un saut de page par page"""
+    doc = Document()
+    doc.sections[0].header.paragraphs[0].text = CDC_HEADER
+    doc.sections[0].footer.paragraphs[0].text = CDC_FOOTER
+    for page in content:
+        doc.add_heading(page["title"], level=2)
+        for paragraph in page["paragraphs"]:
+            doc.add_paragraph(paragraph)
+        table = doc.add_table(rows=len(page["table"]), cols=2)
+        for row, (reference, rule) in zip(table.rows, page["table"]):
+            row.cells[0].text = reference
+            row.cells[1].text = rule
+        doc.add_page_break()
+    doc.save(path)
+
+def write_cdc_pdf(path, content):
+    """Écrit un CDC synthétique en PDF (une figure matplotlib par page, polices TrueType extractibles)"""
+    with matplotlib.rc_context({"pdf.fonttype": 42}), PdfPages(path) as pdf:
+        for number, page in enumerate(content, 1):
+            fig = plt.figure(figsize=(8.27, 11.69))
+            fig.text(0.08, 0.96, CDC_HEADER, fontsize=8)
+            fig.text(0.08, 0.91, page["title"], fontsize=13, weight="bold")
+            y = 0.87
+            for paragraph in page["paragraphs"]:
+                fig.text(0.08, y, paragraph, fontsize=8, wrap=True)
+                y -= 0.06
+            for reference, rule in page["table"]:
+                fig.text(0.08, y, reference, fontsize=8)
+                fig.text(0.25, y, rule, fontsize=8)
+                y -= 0.04
+            fig.text(0.08, 0.03, f"{CDC_FOOTER} - page {number}", fontsize=8)
+            pdf.savefig(fig)
+            plt.close(fig)
+
+def _python_docx_text(path):
+    """Ancienne extraction DOCX : arbre python-docx complet, paragraphes du corps uniquement"""
+    doc = Document(path)
+    return "\n".join([p.text for p in doc.paragraphs if p.text.strip()])
+
+def _streaming_docx_text(path):
+    return "".join(App._iter_docx_paragraphs(path))
+
+def measure(func, *args):
+    """Temps d'exécution (s) et pic d'allocation Python (Mo) d'un appel"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return result, seconds, peak
+
+def bench_docx(pages):
+    """Compare l'extraction DOCX python-docx et le parseur OOXML incrémental"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"cdc_{pages}.docx")
+        write_cdc_docx(path, generate_cdc(pages))
+        print(f"DOCX synthétique : {pages} pages, {os.path.getsize(path) / 2**20:.1f} Mo")
+        for name, func in [("python-docx", _python_docx_text), ("ooxml-stream", _streaming_docx_text)]:
+            text, seconds, peak = measure(func, path)
+            print(f"{name:>14} : {seconds:6.2f} s, {pages / seconds:8.1f} pages/s, "
+                  f"pic mémoire {peak:7.1f} Mo, {len(text)} caractères")
+
+def _normalize_rule(rule):
+    return App.clean_rule(rule).lower()
+
+def bench_profiles(corpus_dir):
+    """
+    Débit (pages/s) et rappel de l'extraction des règles pour chaque profil pdfminer.
+    Les règles de référence d'un PDF sont lues dans <nom>.rules.txt (une par ligne) ;
+    à défaut, celles obtenues avec le profil « accurate » servent de référence.
+    """
+    paths = sorted(glob.glob(os.path.join(corpus_dir, "*.pdf")))
+    if not paths:
+        raise SystemExit(f"Aucun PDF dans {corpus_dir}")
+
+    totals = {profile: {"pages": 0, "seconds": 0.0, "found": 0, "expected": 0} for profile in App.PDF_PROFILES}
+    for path in paths:
+        with open(path, "rb") as f:
+            pages = sum(1 for _ in PDFPage.get_pages(f))
+
+        texts = {}
+        for profile in App.PDF_PROFILES:
+            start = time.perf_counter()
+            texts[profile] = App.extract_pdf_text(path, workers=1, profile=profile)
+            totals[profile]["seconds"] += time.perf_counter() - start
+            totals[profile]["pages"] += pages
+
+        reference_path = os.path.splitext(path)[0] + ".rules.txt"
+        if os.path.exists(reference_path):
+            with open(reference_path, encoding="utf-8") as f:
+                reference = {_normalize_rule(line) for line in f if line.strip()}
+        else:
+            reference = {_normalize_rule(rule) for rule in App.find_rule_matches(texts["accurate"])}
+
+        for profile, text in texts.items():
+            found = {_normalize_rule(rule) for rule in App.find_rule_matches(text)}
+            totals[profile]["found"] += len(found & reference)
+            totals[profile]["expected"] += len(reference)
+
+    print(f"{len(paths)} PDF de référence")
+    for profile, total in totals.items():
+        recall = total["found"] / total["expected"] if total["expected"] else 1.0
+        print(f"{profile:>9} : {total['pages'] / total['seconds']:8.1f} pages/s, rappel des règles {recall:6.1%}")
+
+def cdc_text(pages, seed=0):
+    """Texte brut d'un CDC synthétique, une page par bloc comme après extraction PDF"""
+    return "".join(
+        "\n\n".join([page["title"], *page["paragraphs"], *(" ".join(row) for row in page["table"])]) + "\n\f"
+        for page in generate_cdc(pages, seed=seed)
+    )
+
+def bench_nlp_scaling(pages, max_processes, batch_size):
+    """Débit de l'analyse spaCy découpée (pipe_texts) de 1 à max_processes processus"""
+    nlp_model = App.load_nlp_model()
+    blocks = App.split_blocks(cdc_text(pages))
+    characters = sum(len(block) for block in blocks)
+    print(f"{len(blocks)} blocs, {characters} caractères, batch_size={batch_size}")
+    baseline = None
+    for n_process in range(1, max_processes + 1):
+        start = time.perf_counter()
+        docs = list(App.pipe_texts(blocks, nlp_model, n_process=n_process, batch_size=batch_size))
+        seconds = time.perf_counter() - start
+        baseline = baseline or seconds
+        print(f"{n_process:>2} processus : {seconds:7.2f} s, {characters / seconds / 1000:7.1f} k car./s, "
+              f"accélération x{baseline / seconds:4.2f}, {sum(len(doc) for doc in docs)} tokens")
+
+def bench_nlp_stages(pages):
+    """Temps de chargement et débit (docs/s) de chaque vue de pipeline définie dans App.NLP_STAGES"""
+    blocks = App.split_blocks(cdc_text(pages))
+    print(f"{len(blocks)} blocs (pages)")
+    for stage in App.NLP_STAGES:
+        start = time.perf_counter()
+        nlp_model = App._load_stage_pipeline(stage)
+        load_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in App.pipe_texts(blocks, nlp_model, n_process=1):
+            pass
+        seconds = time.perf_counter() - start
+        print(f"{stage:>9} : chargement {load_seconds:5.2f} s, {len(blocks) / seconds:7.1f} docs/s, "
+              f"vecteurs {nlp_model.vocab.vectors.shape}, composants {nlp_model.pipe_names}")
+
+def _frequency_agreement(reference, candidate):
+    """Part des occurrences de mots communes aux deux distributions de fréquences"""
+    common = sum(min(count, candidate.get(word, 0)) for word, count in reference.items())
+    return common / max(sum(reference.values()), sum(candidate.values()), 1)
+
+def bench_cleaning(pages, corpus_dir=None, top_n=50):
+    """Débit des moteurs de nettoyage de clean_text et accord du moteur « fast » avec spaCy"""
+    if corpus_dir:
+        texts = []
+        for path in sorted(glob.glob(os.path.join(corpus_dir, "*.txt"))):
+            with open(path, encoding="utf-8") as f:
+                texts.append(f.read())
+    else:
+        texts = [cdc_text(pages)]
+    characters = sum(len(text) for text in texts)
+    print(f"{len(texts)} textes, {characters} caractères")
+
+    nlp_model = App.load_nlp_model()
+    App.lemma_lookup_table()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # Cache vide : l'analyse spaCy n'est pas reprise d'une exécution précédente
+        App.CACHE_DIR = tmp
+        for engine in App.CLEAN_ENGINES:
+            start = time.perf_counter()
+            cleaned = " ".join(App.clean_text(text, nlp_model, engine=engine) for text in texts)
+            seconds = time.perf_counter() - start
+            results[engine] = App.calculate_frequencies(cleaned).to_dict()
+            print(f"{engine:>6} : {seconds:7.2f} s, {characters / seconds / 1000:8.1f} k car./s, "
+                  f"{len(results[engine])} lemmes distincts")
+
+    reference, fast = results["spacy"], results["fast"]
+    top_reference = set(list(reference)[:top_n])
+    top_fast = set(list(fast)[:top_n])
+    print(f"accord des fréquences : {_frequency_agreement(reference, fast):6.1%}, "
+          f"top {top_n} communs : {len(top_reference & top_fast) / max(len(top_reference | top_fast), 1):6.1%} (Jaccard)")
+
+# Lignes sans ponctuation (dumps de tableaux, listes) qui font exploser les .*? des motifs de règles
+ADVERSARIAL_CELLS = {
+    "tableau": "| si le client | doit | valeur ",
+    "sans_point": "si le système doit alors le client peut ",
+    "point_final": "Lorsqu'un agent doit valider et peut refuser ",
+}
+
+def _legacy_rule_matches(text):
+    """Appariement d'origine : chaque motif sur tout le texte, sans segmentation"""
+    return [match.group() for pattern in App.RULE_PATTERNS for match in re.finditer(pattern, text, re.IGNORECASE)]
+
+def _near_cap_segments(size):
+    """Segments pleins d'amorces juste sous App.RULE_SEGMENT_MAX_CHARS, terminés par un point, sur environ size caractères"""
+    segment = ("si quand " * (App.RULE_SEGMENT_MAX_CHARS // 9 + 1))[:App.RULE_SEGMENT_MAX_CHARS - 10] + ".\n"
+    return segment * max(1, size // len(segment))
+
+def bench_rules_adversarial(sizes, legacy_max):
+    """Temps d'appariement des motifs de règles sur des lignes adverses, avant et après segmentation"""
+    for name, cell in ADVERSARIAL_CELLS.items():
+        for size in sizes:
+            text = (cell * (size // len(cell) + 1))[:size]
+            if name == "point_final":
+                text += "."
+            start = time.perf_counter()
+            found = len(App.find_rule_matches(text))
+            seconds = time.perf_counter() - start
+            line = f"{name:>11} {size:>7} car. : segmenté {seconds * 1000:9.2f} ms ({found} règles)"
+            if size <= legacy_max:
+                start = time.perf_counter()
+                found = len(_legacy_rule_matches(text))
+                line += f", d'origine {(time.perf_counter() - start) * 1000:10.2f} ms ({found} règles)"
+            print(line)
+
+    # Segments juste sous le plafond : ni ignorés par la limite de longueur, ni coupés par la segmentation
+    for size in sizes:
+        text = _near_cap_segments(size)
+        start = time.perf_counter()
+        found = len(App.find_rule_matches(text))
+        line = f"{'sous_plafond':>11} {len(text):>7} car. : segmenté {(time.perf_counter() - start) * 1000:9.2f} ms ({found} règles)"
+        if len(text) <= legacy_max:
+            start = time.perf_counter()
+            found = len(_legacy_rule_matches(text))
+            line += f", d'origine {(time.perf_counter() - start) * 1000:10.2f} ms ({found} règles)"
+        print(line)
+
+def _separate_pass_matches(text):
+    """Une passe re.finditer par motif : règles dans chaque segment de phrase, PDC sur tout le texte"""
+    matches = [("rule", match.span()) for start, end in App.iter_sentence_spans(text)
+               for regex in App.RULE_REGEXES for match in regex.finditer(text, start, end)]
+    matches += [("pdc", match.span()) for regex in App.PDC_REGEXES for match in regex.finditer(text)]
+    return matches
+
+def bench_scanner(pages):
+    """Temps total des passes séparées contre le scanner unique (iter_pattern_matches), résultats comparés"""
+    text = cdc_text(pages)
+    start = time.perf_counter()
+    separate = sorted(_separate_pass_matches(text))
+    separate_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    combined = sorted((family, match.span()) for family, match in App.iter_pattern_matches(text))
+    combined_seconds = time.perf_counter() - start
+
+    print(f"{len(text)} caractères, {len(combined)} correspondances, résultats identiques : {separate == combined}")
+    print(f"passes séparées : {separate_seconds:7.2f} s, scanner unique : {combined_seconds:7.2f} s "
+          f"(x{separate_seconds / combined_seconds:4.2f})")
+
+# ----------------------------
+# SUITE DE RÉFÉRENCE
+# ----------------------------
+
+FORMATS = {
+    "pdf": ("application/pdf", write_cdc_pdf),
+    "docx": ("application/vnd.openxmlformats-officedocument.wordprocessingml.document", write_cdc_docx),
+}
+
+def _versions():
+    versions = {"python": platform.python_version()}
+    for package in ("pdfminer.six", "python-docx", "spacy"):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+def run_suite(sizes, formats=tuple(FORMATS), workers=None, profile=None):
+    """
+    Extrait des CDC synthétiques de chaque taille et format avec un cache vide
+    et mesure le temps total, le débit en pages/s et le pic de mémoire résidente.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for file_format in formats:
+            file_type, writer = FORMATS[file_format]
+            for pages in sizes:
+                path = os.path.join(tmp, f"cdc_{pages}.{file_format}")
+                writer(path, generate_cdc(pages, seed=pages))
+                # Cache vide à chaque mesure : on mesure l'extraction, pas le cache
+                App.CACHE_DIR = os.path.join(tmp, f"cache_{file_format}_{pages}")
+
+                stats = {}
+                with App.measure_peak_rss(stats):
+                    text = App.extract_document_text(path, file_type, workers=workers, profile=profile)
+                result = {
+                    "format": file_format,
+                    "pages": pages,
+                    "file_mb": round(os.path.getsize(path) / 2**20, 2),
+                    "seconds": round(stats["seconds"], 3),
+                    "pages_per_second": round(pages / stats["seconds"], 1),
+                    "peak_rss_mb": round(stats.get("peak_rss_mb", 0.0), 1),
+                    "characters": len(text),
+                }
+                results.append(result)
+                print(f"{file_format:>5} {pages:>5} pages : {result['seconds']:8.2f} s, "
+                      f"{result['pages_per_second']:8.1f} pages/s, pic RSS {result['peak_rss_mb']:8.1f} Mo")
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "versions": _versions(),
+        "settings": {"workers": workers or App.PDF_WORKERS, "profile": profile or App.PDF_PROFILE},
+        "results": results,
+    }
+
+def compare_runs(previous, current):
+    """Affiche l'évolution du débit et de la mémoire par rapport à une exécution précédente"""
+    baseline = {(r["format"], r["pages"]): r for r in previous["results"]}
+    print(f"Comparaison avec l'exécution du {previous['date']} ({previous['versions']})")
+    for result in current["results"]:
+        before = baseline.get((result["format"], result["pages"]))
+        if not before:
+            continue
+        speed = result["pages_per_second"] / before["pages_per_second"] - 1
+        memory = result["peak_rss_mb"] - before["peak_rss_mb"]
+        print(f"{result['format']:>5} {result['pages']:>5} pages : débit {speed:+7.1%}, pic RSS {memory:+8.1f} Mo")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    suite_parser = commands.add_parser("suite", help="débit et mémoire de extract_text sur des CDC synthétiques")
+    suite_parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    suite_parser.add_argument("--formats", nargs="+", choices=list(FORMATS), default=list(FORMATS))
+    suite_parser.add_argument("--workers", type=int)
+    suite_parser.add_argument("--profile", choices=list(App.PDF_PROFILES))
+    suite_parser.add_argument("--output", default="benchmark_results.json")
+    suite_parser.add_argument("--compare", help="fichier JSON d'une exécution précédente")
+
+    generate_parser = commands.add_parser("generate", help="écrit un CDC synthétique en PDF et DOCX")
+    generate_parser.add_argument("--pages", type=int, default=100)
+    generate_parser.add_argument("--seed", type=int, default=0)
+    generate_parser.add_argument("--output", default=".")
+
+    docx_parser = commands.add_parser("docx", help="python-docx contre parseur OOXML incrémental")
+    docx_parser.add_argument("--pages", type=int, default=500)
+
+    profiles_parser = commands.add_parser("profiles", help="débit et rappel des profils d'analyse pdfminer")
+    profiles_parser.add_argument("corpus", help="répertoire de PDF de référence")
+
+    scaling_parser = commands.add_parser("nlp-scaling", help="passage à l'échelle de l'analyse spaCy multi-processus")
+    scaling_parser.add_argument("--pages", type=int, default=300)
+    scaling_parser.add_argument("--max-processes", type=int, default=os.cpu_count() or 1)
+    scaling_parser.add_argument("--batch-size", type=int, default=App.NLP_BATCH_SIZE)
+
+    stages_parser = commands.add_parser("nlp-stages", help="chargement et débit des vues de pipeline par étape")
+    stages_parser.add_argument("--pages", type=int, default=100)
+
+    cleaning_parser = commands.add_parser("cleaning", help="débit et accord des moteurs de nettoyage (spaCy, fast)")
+    cleaning_parser.add_argument("--pages", type=int, default=100)
+    cleaning_parser.add_argument("--corpus", help="répertoire de textes de référence (.txt) à la place du CDC synthétique")
+
+    adversarial_parser = commands.add_parser("rules-adversarial", help="motifs de règles sur des lignes sans ponctuation")
+    adversarial_parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 4000, 16000, 64000])
+    adversarial_parser.add_argument("--legacy-max", type=int, default=16000,
+                                    help="taille maximale mesurée avec l'appariement d'origine")
+
+    scanner_parser = commands.add_parser("scanner", help="passes regex séparées contre scanner unique règles + PDC")
+    scanner_parser.add_argument("--pages", type=int, default=2000)
+
+    args = parser.parse_args()
+    if args.command == "suite":
+        run = run_suite(args.sizes, args.formats, workers=args.workers, profile=args.profile)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(run, f, ensure_ascii=False, indent=2)
+        print(f"Résultats écrits dans {args.output}")
+        if args.compare:
+            with open(args.compare, encoding="utf-8") as f:
+                compare_runs(json.load(f), run)
+    elif args.command == "generate":
+        os.makedirs(args.output, exist_ok=True)
+        content = generate_cdc(args.pages, seed=args.seed)
+        for file_format, (_, writer) in FORMATS.items():
+            writer(os.path.join(args.output, f"cdc_{args.pages}.{file_format}"), content)
+    elif args.command == "docx":
+        bench_docx(args.pages)
+    elif args.command == "profiles":
+        bench_profiles(args.corpus)
+    elif args.command == "nlp-scaling":
+        # Tous les blocs sont analysés en parallèle, quel que soit leur nombre
+        App.NLP_PARALLEL_MIN_CHUNKS = 0
+        bench_nlp_scaling(args.pages, args.max_processes, args.batch_size)
+    elif args.command == "nlp-stages":
+        bench_nlp_stages(args.pages)
+    elif args.command == "cleaning":
+        bench_cleaning(args.pages, args.corpus)
+    elif args.command == "rules-adversarial":
+        bench_rules_adversarial(args.sizes, args.legacy_max)
+    elif args.command == "scanner":
+        bench_scanner(args.pages)
+
+if __name__ == "__main__":
+    main()